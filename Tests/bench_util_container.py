@@ -0,0 +1,162 @@
+# bench_util_container.py
+# Benchmarks for util_container.py code (not part of the unit test run).
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Run directly, with the folder containing Util/ on the PYTHONPATH (the same
+#     setup the unit tests need):  python bench_util_container.py
+#   - Uses its own bench.db in the current folder and deletes it when done.
+import os
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+from Util.util_container import ArrayLinkList, DoubleLinkList, ListOfLists, ListTable
+from Util.util_db import Database
+
+BENCHDB = 'bench.db'
+
+
+class LegacyNode:
+    """ The original DoubleLinkList.Node, with a per-instance __dict__. """
+
+    def __init__(self, nodeId=None, childId=None, sublist=None, label=''):
+        self.nodeId = nodeId
+        self.nref = None
+        self.pref = None
+        self.childId = childId
+        self.sublist = sublist
+        self.label = label
+
+
+class LegacyList:
+    """ The original DoubleLinkList attributes, with a per-instance __dict__. """
+
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.cursor = None
+
+
+def buildChain(db, tableName, size):
+    """ Insert <size> linked nodes, returning the first node's ID. """
+    nodeIds = db.insertMany(tableName, [dict(label='node')] * size)
+    links = [(nodeId, dict(nextId=nextId)) for nodeId, nextId in zip(nodeIds, nodeIds[1:])]
+    db.updateMany(tableName, links)
+    return nodeIds[0]
+
+
+def buildTable(db, tableName, size, columns=0):
+    """ Fill a ListTable with one chain of <size> nodes, or with <columns>
+        sublists sharing <size> nodes between them. """
+    table = ListTable(db, tableName)
+    with db.transaction():
+        if not columns:
+            table.saveHeadId(buildChain(db, tableName, size))
+            return table
+        listIds = db.insertMany(tableName, [dict(label='list')] * columns)
+        for n, listId in enumerate(listIds):
+            nextListId = listIds[n + 1] if n + 1 < columns else None
+            headId = buildChain(db, tableName, size // columns)
+            db.update(listId, tableName, dict(nextId=nextListId, childId=headId))
+        table.saveHeadId(listIds[0])
+    return table
+
+
+def legacyLoad(table, theList):
+    """ The original loader: one selectById() round trip per node. """
+    nextId = table.loadHeadId()
+    while nextId:
+        rec = table.db.selectById(table.tableName, nextId)
+        theList.addNode(appendIt=True, nodeId=rec['nodeId'], childId=rec['childId'],
+                        label=rec['label'])
+        nextId = rec['nextId']
+
+
+def legacyLoadListOfLists(table, theList):
+    """ The original 2-dimensional loader, also one round trip per node. """
+    nextListId = table.loadHeadId()
+    while nextListId:
+        rec = table.db.selectById(table.tableName, nextListId)
+        childId = rec['childId']
+        theList.addList(appendIt=True, nodeId=rec['nodeId'], childId=childId,
+                        label=rec['label'])
+        nextListId = rec['nextId']
+        nextNodeId = childId
+        while nextNodeId:
+            rec = table.db.selectById(table.tableName, nextNodeId)
+            theList.addNode(appendIt=True, nodeId=rec['nodeId'],
+                            childId=rec['childId'], label=rec['label'])
+            nextNodeId = rec['nextId']
+
+
+def bytesPer(factory, count):
+    """ Average traced bytes allocated per object over <count> objects. """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = [factory(n) for n in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Leave out the list holding the objects themselves
+    return (after - before - keep.__sizeof__()) / count
+
+
+def timeIt(func, *args):
+    """ Return elapsed seconds for one call. """
+    start = perf_counter()
+    func(*args)
+    return perf_counter() - start
+
+
+def benchLoad(sizes=(10000, 100000)):
+    """ Compare the per-node loaders with the single-query loaders. """
+    print('ListTable load, seconds (legacy per-node vs single query)')
+    for size in sizes:
+        with Database(BENCHDB) as db:
+            table = buildTable(db, 'flat' + str(size), size)
+            old = timeIt(legacyLoad, table, DoubleLinkList())
+            new = timeIt(table.load, DoubleLinkList())
+            print('  load            {:>7,} nodes: {:8.3f} {:8.3f}  ({:.1f}x)'
+                  .format(size, old, new, old / new))
+            table = buildTable(db, 'grid' + str(size), size, columns=100)
+            old = timeIt(legacyLoadListOfLists, table, ListOfLists())
+            new = timeIt(table.loadListOfLists, ListOfLists())
+            print('  loadListOfLists {:>7,} nodes: {:8.3f} {:8.3f}  ({:.1f}x)'
+                  .format(size, old, new, old / new))
+
+
+def benchMemory(count=100000):
+    """ Report bytes per node and per list (column), before and after slots. """
+    print('Memory, bytes each (legacy __dict__ vs __slots__)')
+    old = bytesPer(lambda n: LegacyNode(nodeId=n, label='node'), count)
+    new = bytesPer(lambda n: DoubleLinkList.Node(nodeId=n, label='node'), count)
+    print('  Node             {:8.1f} {:8.1f}'.format(old, new))
+    old = bytesPer(lambda n: LegacyList(), count // 10)
+    new = bytesPer(lambda n: DoubleLinkList(), count // 10)
+    print('  DoubleLinkList   {:8.1f} {:8.1f}  (new one includes its ID index)'
+          .format(old, new))
+
+    def fullList(_n):
+        theList = DoubleLinkList()
+        for nodeId in range(count):
+            theList.addNode(appendIt=True, nodeId=nodeId, label='node')
+        return theList
+    def fullArrayList(_n):
+        theList = ArrayLinkList()
+        for nodeId in range(count):
+            theList.addNode(appendIt=True, nodeId=nodeId, label='node')
+        return theList
+    print('  per node in a {:,} node list: DoubleLinkList {:.1f}, ArrayLinkList {:.1f}'
+          .format(count, bytesPer(fullList, 1) / count, bytesPer(fullArrayList, 1) / count))
+
+
+if __name__ == '__main__':
+    if Path(BENCHDB).exists():
+        os.remove(BENCHDB)
+    try:
+        benchMemory()
+        benchLoad()
+    finally:
+        os.remove(BENCHDB)
@@ -0,0 +1,75 @@
+# bench_util_db.py
+# Benchmarks for util_db.py code (not part of the unit test run).
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Run directly, with the folder containing Util/ on the PYTHONPATH (the same
+#     setup the unit tests need):  python bench_util_db.py
+#   - Uses its own bench.db in the current folder and deletes it when done.
+#   - Single writes commit one at a time (like per-node saves), so they show
+#     the cost of each commit's syncs; batches show raw throughput.
+import glob
+import os
+from time import perf_counter
+
+from Util.util_container import ListTable
+from Util.util_db import Database, PRAGMAPROFILES
+
+BENCHDB = 'bench.db'
+
+
+def removeDb():
+    """ Delete the bench database, with any WAL and shared-memory files. """
+    for name in glob.glob(BENCHDB + '*'):
+        os.remove(name)
+
+
+def rate(count, func, *args):
+    """ Return rows per second for one call handling <count> rows. """
+    start = perf_counter()
+    func(*args)
+    return count / (perf_counter() - start)
+
+
+def benchProfile(profile, singles, batch):
+    """ Insert and update rates on the ListTable schema, for one profile. """
+    removeDb()
+    with Database(BENCHDB, profile=profile) as db:
+        table = ListTable(db, 'bench')
+        name = table.tableName
+        record = dict(nextId=None, childId=None, label='node')
+
+        def insertSingles():
+            for _ in range(singles):
+                db.insert(name, record)
+
+        def updateSingles():
+            for n in range(singles):
+                db.update(n + 2, name, dict(nextId=n + 3, label='linked'))
+
+        rates = [rate(singles, insertSingles),
+                 rate(batch, db.insertMany, name, [record] * batch),
+                 rate(singles, updateSingles),
+                 rate(batch, db.updateMany, name,
+                      [(n + 2, dict(nextId=n + 3)) for n in range(batch)])]
+    print('  {:12} {:>10,.0f} {:>10,.0f} {:>10,.0f} {:>10,.0f}'
+          .format(profile or '(defaults)', *rates))
+
+
+def benchProfiles(singles=2000, batch=100000):
+    """ Compare SQLite's defaults with each pragma profile. """
+    print('Rows per second ({:,} single commits, {:,} row batches)'.format(singles, batch))
+    print('  {:12} {:>10} {:>10} {:>10} {:>10}'
+          .format('profile', 'insert', 'insertMany', 'update', 'updateMany'))
+    for profile in [None] + list(PRAGMAPROFILES):
+        benchProfile(profile, singles, batch)
+
+
+if __name__ == '__main__':
+    removeDb()
+    try:
+        benchProfiles()
+    finally:
+        removeDb()
@@ -0,0 +1,120 @@
+# bench_util_grid.py
+# Benchmarks for util_grid.py code (not part of the unit test run).
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Run directly, with the folder containing Util/ on the PYTHONPATH (the same
+#     setup the unit tests need):  python bench_util_grid.py [max board size]
+#   - Uses stand-in widgets, so no display is needed.
+import sys
+from math import isqrt
+from time import perf_counter
+
+from Util.globals import MOVEPUSH
+from Util.util_grid import GridModel, Selection
+
+
+class FakeWidget:
+    """ Just enough of a WidgetFrame for Selection and GridModel. """
+    __slots__ = ('row', 'col')
+
+    def __init__(self, row, col):
+        self.row = row
+        self.col = col
+
+    def getPosition(self):
+        return self.row, self.col
+
+    def setPosition(self, row, col, save=True):
+        self.row = row
+        self.col = col
+
+
+class LegacySelection:
+    """ The original list-backed Selection, rescanning on every change. """
+
+    def __init__(self):
+        self.items = []
+        self.top = self.left = self.bottom = self.right = None
+
+    def add(self, widget):
+        if not self.items.__contains__(widget):
+            self.items.append(widget)
+        self._setExtents()
+
+    def remove(self, widget):
+        if self.items.__contains__(widget):
+            self.items.remove(widget)
+        self._setExtents()
+
+    def _setExtents(self):
+        for widget in self.items:
+            row, col = widget.getPosition()
+            if not self.left or col < self.left:
+                self.left = col
+            if not self.right or col > self.right:
+                self.right = col
+            if not self.top or row < self.top:
+                self.top = row
+            if not self.bottom or row > self.bottom:
+                self.bottom = row
+
+
+def buildBoard(size):
+    """ A square-ish GridModel holding <size> widgets, with one spare column. """
+    cols = isqrt(size)
+    rows = -(-size // cols)
+    model = GridModel(rows=rows, cols=cols + 1)
+    for n in range(size):
+        model.put(FakeWidget(n // cols, n % cols))
+    return model
+
+
+def timeIt(func, *args):
+    """ Return elapsed seconds for one call. """
+    start = perf_counter()
+    func(*args)
+    return perf_counter() - start
+
+
+def selectAndDeselect(selection, widgets):
+    """ Select every widget, then unselect every other one. """
+    for widget in widgets:
+        selection.add(widget)
+    for widget in widgets[::2]:
+        selection.remove(widget)
+
+
+def benchSelection(sizes=(1000, 10000)):
+    """ Compare the list-backed and the set-backed Selection. """
+    print('Selection add + remove, seconds (legacy vs incremental)')
+    for size in sizes:
+        widgets = [FakeWidget(n // 100, n % 100) for n in range(size)]
+        # The legacy version is O(n^2): expect ~20 seconds for 10k widgets
+        old = timeIt(selectAndDeselect, LegacySelection(), widgets)
+        new = timeIt(selectAndDeselect, Selection(None), widgets)
+        print('  {:>7,} widgets: {:8.3f} {:8.4f}  ({:.0f}x)'.format(size, old, new, old / new))
+
+
+def benchModel(sizes=(1000, 10000, 100000, 1000000)):
+    """ Time the main GridModel operations on boards of increasing size. """
+    print('GridModel, seconds: build, select 100x100, push it right, insert row, select all')
+    for size in sizes:
+        start = perf_counter()
+        model = buildBoard(size)
+        build = perf_counter() - start
+        middle = model.gridRows // 2
+        select = timeIt(model.selectRange, middle, 0, middle + 99, 99)
+        push = timeIt(model.move, 0, 1, MOVEPUSH)
+        insert = timeIt(model.insertRows, middle)
+        selectAll = timeIt(model.selectAll)
+        print('  {:>9,} widgets: {:8.3f} {:8.4f} {:8.4f} {:8.4f} {:8.4f}'
+              .format(size, build, select, push, insert, selectAll))
+
+
+if __name__ == '__main__':
+    maxSize = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    benchModel([size for size in (1000, 10000, 100000, 1000000) if size <= maxSize])
+    benchSelection()
@@ -12,5 +12,104 @@
 #       - This is the reason for the X index (test_X_methodname), in case unittest
 #         wants to run the tests alphabetically.
 
-class TestUtil:
-    pass
+#   - Scheduler tests use short intervals, and allow for a little timing slack.
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from Util import util
+from Util.util import PollTimer, Scheduler
+
+
+class TestScheduler(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scheduler = Scheduler()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scheduler.stop()
+
+    def test_1_every(self):
+        print('**TestScheduler**')
+        print('TEST every(): many jobs, one thread, on the beat')
+        threads = threading.active_count()
+        jobs = [self.scheduler.every(0.05, lambda: None, jitter=0.01) for _ in range(20)]
+        time.sleep(0.28)
+        self.assertEqual(threading.active_count(), threads + 1, 'one worker thread')
+        for job in jobs:
+            job.cancel()
+            self.assertIn(job.runs, range(4, 7), 'about 5 ticks each')
+            self.assertEqual(job.overruns, 0, 'no overruns')
+
+    def test_2_overruns(self):
+        print('TEST run(): fixed rate skips missed ticks, fixed delay waits')
+        slowRate = self.scheduler.every(0.05, time.sleep, 0.08)
+        time.sleep(0.45)
+        slowRate.cancel()
+        self.assertGreater(slowRate.overruns, 0, 'ticks skipped')
+        self.assertIn(slowRate.runs, range(3, 6), 'every other tick')
+        slowDelay = self.scheduler.every(0.05, time.sleep, 0.08, fixedRate=False)
+        time.sleep(0.45)
+        slowDelay.cancel()
+        self.assertEqual(slowDelay.overruns, slowDelay.runs, 'every run overran')
+        self.assertIn(slowDelay.runs, range(2, 5), 'run plus delay each time')
+
+    def test_3_pause(self):
+        print('TEST pause(), resume(), cancel(): ticks stop and restart')
+        job = self.scheduler.every(0.03, lambda: None)
+        time.sleep(0.1)
+        job.pause()
+        self.assertFalse(job.isActive(), 'paused')
+        runs = job.runs
+        time.sleep(0.1)
+        self.assertEqual(job.runs, runs, 'no ticks while paused')
+        job.resume()
+        time.sleep(0.1)
+        self.assertGreater(job.runs, runs, 'ticking again')
+        job.cancel()
+        runs = job.runs
+        time.sleep(0.1)
+        self.assertEqual(job.runs, runs, 'no ticks once cancelled')
+
+    def test_4_errors(self):
+        print('TEST run(): a failing job keeps its tick, and the others theirs')
+        job = self.scheduler.every(0.03, lambda: 1 / 0)
+        time.sleep(0.1)
+        job.cancel()
+        self.assertGreater(job.runs, 1, 'still ticking')
+
+    def test_5_badJobs(self):
+        print('TEST Job: bad intervals are refused, and a broken job stops alone')
+        with self.assertRaises(ValueError):
+            self.scheduler.every(0, lambda: None)
+        broken = self.scheduler.every(0.03, lambda: None)
+        good = self.scheduler.every(0.03, lambda: None)
+        # Breaks the job's rescheduling math, outside its function
+        broken.interval = 0
+        time.sleep(0.15)
+        runs = good.runs
+        time.sleep(0.1)
+        good.cancel()
+        self.assertFalse(broken.isActive(), 'broken job dropped')
+        self.assertGreater(good.runs, runs, 'others still tick')
+        self.assertTrue(self.scheduler.thread.is_alive(), 'worker still running')
+
+    def test_6_pollTimer(self):
+        print('TEST PollTimer: minutes, on the shared scheduler')
+        ticks = []
+        timer = PollTimer(0.001, ticks.append, 'tick')
+        self.assertIs(timer.scheduler, util.getScheduler(), 'shared')
+        self.assertAlmostEqual(timer.interval, 0.06, msg='interval in seconds')
+        timer.start()
+        time.sleep(0.2)
+        timer.cancel()
+        self.assertIn(len(ticks), range(2, 5), 'about 3 ticks')
+
+    def test_Z_done(self):
+        print('----- Scheduler test completed -----')
+
+
+if __name__ == '__main__':
+    unittest.main()
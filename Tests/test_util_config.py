@@ -0,0 +1,119 @@
+# test_util_config.py
+# A set of unit tests for util_config.py code.
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Same conventions as test_util_container.py: tests are numbered
+#     (test_X_methodname) since some rely on data left by preceding tests.
+#   - The config file goes in a temporary home folder.
+import gc
+import os
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from unittest import TestCase
+
+from Util.globals import RECENTFILEMAX
+from Util import util_config
+from Util.util_config import Config, openConfigs
+
+
+class TestConfig(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.home = tempfile.TemporaryDirectory()
+        cls.oldHome = os.environ.get('HOME')
+        os.environ['HOME'] = cls.home.name
+        cls.cfg = Config('test_app', debounce=0.2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cfg.flush()
+        if cls.oldHome is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = cls.oldHome
+        cls.home.cleanup()
+
+    def test_1_debounce(self):
+        print('**TestConfig**')
+        print('TEST setSection(): changes are batched into one write')
+        self.cfg.addRecentFile('/projects/one.db')
+        self.cfg.setInt('gridRows', 12)
+        self.assertFalse(os.path.exists(self.cfg.filename), 'nothing written yet')
+        self.assertEqual(self.cfg.writesSaved, RECENTFILEMAX + 1, 'all but one write saved')
+        threads = threading.active_count()
+        for n in range(100):
+            self.cfg.setInt('width', n)
+        self.assertEqual(threading.active_count(), threads, 'no timer thread per change')
+        time.sleep(0.5)
+        self.assertTrue(os.path.exists(self.cfg.filename), 'written after the pause')
+        self.assertFalse(self.cfg.dirty, 'nothing left to write')
+
+    def test_2_flush(self):
+        print('TEST flush(): writes right away, atomically')
+        self.cfg.set('title', 'My Desktop')
+        self.cfg.flush()
+        self.assertFalse(os.path.exists(self.cfg.filename + '.tmp'), 'temp file replaced')
+        other = Config('test_app')
+        self.assertEqual(other.get('title'), 'My Desktop', 'string saved')
+        self.assertEqual(other.getInt('gridRows'), 12, 'integer saved')
+        self.assertEqual(other.recentFiles, ['/projects/one.db'], 'recent files saved')
+        self.assertEqual(other.getLastPath(), '/projects', 'last path saved')
+
+    def test_3_typed(self):
+        print('TEST getBool(), getFloat(), getList(): typed and cached')
+        self.cfg.setBool('snap', True)
+        self.cfg.setFloat('zoom', 0.75)
+        self.cfg.setList('columns', [120, 'auto'])
+        self.assertIs(self.cfg.getBool('snap'), True, 'boolean')
+        self.assertEqual(self.cfg.getFloat('zoom'), 0.75, 'float')
+        self.assertEqual(self.cfg.getList('columns'), [120, 'auto'], 'list')
+        self.assertIs(self.cfg.getList('columns'), self.cfg.getList('columns'), 'cached')
+        self.assertEqual(self.cfg.getInt('zoom', -1), -1, 'not an integer')
+        self.assertEqual(self.cfg.getList('missing', []), [], 'default')
+        self.cfg.setFloat('zoom', 1.5)
+        self.assertEqual(self.cfg.getFloat('zoom'), 1.5, 'setting clears the cache')
+        self.cfg.flush()
+        other = Config('test_app')
+        self.assertIs(other.getBool('snap'), True, 'boolean saved')
+        self.assertEqual(other.getList('columns'), [120, 'auto'], 'list saved')
+
+    def test_4_refresh(self):
+        print('TEST refresh(): re-reads only when the file changed')
+        oldInterval = util_config.CFGSTATINTERVAL
+        util_config.CFGSTATINTERVAL = 0
+        try:
+            other = Config('test_app')
+            other.setInt('gridRows', 120)
+            other.flush()
+            # Different size, so it's seen even within the mtime resolution
+            self.assertEqual(self.cfg.getInt('gridRows'), 120, 'outside change seen')
+            cache = self.cfg.cache
+            self.cfg.refresh()
+            self.assertIn(('general', 'gridrows'), cache, 'unchanged, cache kept')
+        finally:
+            util_config.CFGSTATINTERVAL = oldInterval
+
+    def test_5_exit(self):
+        print('TEST flushAll(): flushes at exit without keeping Configs alive')
+        other = Config('test_app')
+        self.assertIn(other, openConfigs, 'tracked for the exit flush')
+        ref = weakref.ref(other)
+        del other
+        gc.collect()
+        self.assertIsNone(ref(), 'garbage collected')
+        other = Config('test_app')
+        other.close()
+        self.assertNotIn(other, openConfigs, 'closed')
+
+    def test_Z_done(self):
+        print('----- Config test completed -----')
+
+
+if __name__ == '__main__':
+    unittest.main()
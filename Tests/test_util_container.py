@@ -12,11 +12,15 @@
 #       - This is the reason for the X index (test_X_methodname), in case unittest
 #         wants to run the tests alphabetically.
 import os
+import pickle
+import random
+import sqlite3
 import unittest
 from pathlib import Path
 from unittest import TestCase
 
-from Util.util_container import DoubleLinkList, ListTable, ListOfLists, PersistentDoubleLinkList, PersistentListOfLists
+from Util.util_container import DoubleLinkList, ListTable, ListOfLists, PersistentDoubleLinkList, PersistentListOfLists, \
+    IndexedDoubleLinkList, ArrayLinkList
 from Util.util_db import Database
 
 
@@ -280,10 +284,235 @@ class TestDoubleLinkList(TestCase):
         self.assertIsNone(self.dList.getSublist(), 'List not returned from node-2')
         print('TEST COMPLETE')
 
+    def test_H_getById(self):
+        print('TEST GETBYID: index lookups leave the cursor alone')
+        self.dList.findAt(1)
+        node3 = self.dList.getById(333)
+        self.assertIsNotNone(node3, 'node-3 found by ID')
+        self.assertEqual(node3.label, 'node-3', 'node-3 confirmed')
+        self.assertEqual(self.dList.getNodeId(), 222, 'cursor still at node-2')
+        self.assertIsNone(self.dList.getById(999), 'no node-999')
+        print('IDs changed through setNodeId() are re-indexed')
+        self.dList.setNodeId(2222)
+        self.assertIsNone(self.dList.getById(222), 'old ID gone')
+        self.assertEqual(self.dList.getById(2222).label, 'node-2', 'new ID found')
+        self.dList.setNodeId(222)
+        print('IDs set directly on a node are found after a reindex')
+        node = self.dList.addNode(label='node-x')
+        node.nodeId = 888
+        self.assertEqual(self.dList.getById(888), node, 'late ID found')
+        self.dList.delete(node)
+        self.assertIsNone(self.dList.getById(888), 'deleted node unindexed')
+        print('Unsaved nodes are tracked, not found by a full reindex')
+        node = self.dList.addNode(label='node-y')
+        self.assertIsNone(self.dList.getById(999), 'still no node-999')
+        self.assertEqual(self.dList.pending, {node}, 'one node without an ID')
+        node.nodeId = 777
+        self.assertEqual(self.dList.getById(777), node, 'late ID found')
+        self.assertEqual(self.dList.pending, set(), 'nothing pending')
+        self.dList.delete(node)
+        self.assertEqual(len(self.dList.index), 5, 'index matches the list')
+
+    def test_J_iterate(self):
+        print('TEST ITERATE: iter, reversed, len and iterFrom leave the cursor alone')
+        self.dList.findAt(2)
+        ids = [node.nodeId for node in self.dList]
+        self.assertEqual(ids, [111, 222, 333, 444, 555], 'forward order')
+        self.assertEqual([node.nodeId for node in reversed(self.dList)], ids[::-1],
+                         'reverse order')
+        self.assertEqual(len(self.dList), 5, 'length tracked')
+        node4 = self.dList.getById(444)
+        self.assertEqual([node.nodeId for node in self.dList.iterFrom(node4)], [444, 555],
+                         'from node-4 on')
+        self.assertEqual([node.nodeId for node in self.dList.iterFrom(node4, reverse=True)],
+                         [444, 333, 222, 111], 'from node-4 back')
+        self.assertEqual(self.dList.getNodeId(), 333, 'cursor still at node-3')
+        print('Nested loops over one list do not disturb each other')
+        pairs = [(a.nodeId, b.nodeId) for a in self.dList for b in self.dList]
+        self.assertEqual(len(pairs), 25, 'all pairs visited')
+
+    def test_I_slots(self):
+        print('TEST SLOTS: nodes and lists carry no per-instance __dict__')
+        self.assertFalse(hasattr(self.dList.head, '__dict__'), 'slotted node')
+        self.assertFalse(hasattr(self.dList, '__dict__'), 'slotted list')
+        self.assertFalse(hasattr(ListOfLists(), '__dict__'), 'slotted list of lists')
+        with self.assertRaises(AttributeError):
+            self.dList.head.color = 'red'
+
     def test_Z_done(self):
         print('----- DoubleLinkList test completed -----')
 
 
+class TestIndexedDoubleLinkList(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.iList = IndexedDoubleLinkList()
+        cls.shadow = []
+
+    def test_1_addNode(self):
+        print('**TestIndexedDoubleLinkList**')
+        print('TEST addNode: random inserts and appends match a plain list')
+        rand = random.Random(42)
+        for n in range(500):
+            if not self.shadow or rand.random() < 0.3:
+                self.iList.addNode(appendIt=True, nodeId=n)
+                self.shadow.append(n)
+            else:
+                at = rand.randrange(len(self.shadow))
+                self.iList.findAt(at)
+                self.iList.addNode(nodeId=n)
+                self.shadow.insert(at, n)
+        self.assertEqual(len(self.iList), len(self.shadow), 'lengths match')
+        node, ids = self.iList.first(), []
+        while node:
+            ids.append(node.nodeId)
+            node = node.nref
+        self.assertEqual(ids, self.shadow, 'linked order matches')
+
+    def test_2_findAt(self):
+        print('TEST findAt and indexOf: every position agrees')
+        for at, nodeId in enumerate(self.shadow):
+            node = self.iList.findAt(at)
+            self.assertEqual(node.nodeId, nodeId, 'node at index ' + str(at))
+            self.assertEqual(self.iList.cursor, node, 'cursor moved to node')
+            self.assertEqual(self.iList.indexOf(node), at, 'index of node')
+        self.iList.findAt(3)
+        self.assertIsNone(self.iList.findAt(len(self.shadow)), 'out of bounds')
+        self.assertEqual(self.iList.getNodeId(), self.shadow[3], 'cursor unchanged')
+
+    def test_3_delete(self):
+        print('TEST delete: random deletes keep positions right')
+        rand = random.Random(7)
+        for _ in range(250):
+            at = rand.randrange(len(self.shadow))
+            self.iList.delete(self.iList.findAt(at))
+            del self.shadow[at]
+        self.assertEqual(len(self.iList), len(self.shadow), 'lengths match')
+        for at, nodeId in enumerate(self.shadow):
+            self.assertEqual(self.iList.findAt(at).nodeId, nodeId, 'node at ' + str(at))
+        self.iList.first()
+        self.iList.delete()
+        self.shadow.pop(0)
+        self.assertEqual(self.iList.indexOf(self.iList.head), 0, 'new head at 0')
+        self.assertEqual(self.iList.findAt(0).nodeId, self.shadow[0], 'head ok')
+
+    def test_4_sublistClass(self):
+        print('TEST ListOfLists.sublistClass: indexed columns')
+        lol = ListOfLists(sublistClass=IndexedDoubleLinkList)
+        lol.addList(appendIt=True)
+        for n in range(10):
+            lol.addNode(appendIt=True, nodeId=n)
+        self.assertEqual(len(lol.getSublist()), 10, 'indexed sublist length')
+        self.assertEqual(lol.getSublist().findAt(7).nodeId, 7, 'indexed findAt')
+
+    def test_Z_done(self):
+        print('----- IndexedDoubleLinkList test completed -----')
+
+
+class TestArrayLinkList(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.aList = ArrayLinkList()
+
+    def labels(self):
+        return [node.label for node in self.aList]
+
+    def test_1_addNode(self):
+        print('**TestArrayLinkList**')
+        print('TEST addNode: append, insert at head, insert mid-list')
+        self.assertIsNone(self.aList.first(), 'empty list has no first node')
+        node1 = self.aList.addNode(appendIt=True, label='node-1', nodeId=111)
+        node3 = self.aList.addNode(appendIt=True, label='node-3', nodeId=333, childId=3)
+        self.assertEqual(node3.pref, node1, 'node-3 follows node-1')
+        self.assertEqual(self.aList.cursor, node3.slot, 'cursor at node-3')
+        node2 = self.aList.addNode(label='node-2', nodeId=222)
+        self.assertEqual(node2.nref, node3, 'node-2 inserted before node-3')
+        self.aList.first()
+        node0 = self.aList.addNode(label='node-0')
+        self.assertTrue(self.aList.atHead(), 'node-0 is the new head')
+        self.assertIsNone(node0.nodeId, 'no ID yet')
+        self.assertEqual(self.labels(), ['node-0', 'node-1', 'node-2', 'node-3'], 'order ok')
+        self.assertEqual(len(self.aList), 4, '4 nodes')
+        self.assertEqual(node3.childId, 3, 'child ID stored')
+
+    def test_2_navigate(self):
+        print('TEST first/next/last/previous and getters')
+        self.assertEqual(self.aList.first().label, 'node-0', 'first')
+        self.assertEqual(self.aList.next().label, 'node-1', 'next')
+        self.assertEqual(self.aList.getNodeId(), 111, 'getNodeId')
+        self.assertEqual(self.aList.last().label, 'node-3', 'last')
+        self.assertIsNone(self.aList.next(), 'nothing after tail')
+        self.assertTrue(self.aList.atTail(), 'still at tail')
+        self.assertEqual(self.aList.previous().label, 'node-2', 'previous')
+        self.aList.setLabel('node-2a')
+        self.assertEqual(self.aList.getLabel(), 'node-2a', 'setLabel')
+
+    def test_3_find(self):
+        print('TEST find, findAt and getById')
+        self.assertEqual(self.aList.find(DoubleLinkList.Node(nodeId=333)).label, 'node-3',
+                         'found by node ID')
+        self.assertEqual(self.aList.findAt(1).nodeId, 111, 'found at index 1')
+        self.assertIsNone(self.aList.findAt(9), 'out of bounds')
+        self.assertEqual(self.aList.getNodeId(), 111, 'cursor unchanged')
+        self.assertIsNone(self.aList.getById(999), 'no node-999')
+
+    def test_4_delete(self):
+        print('TEST delete: cursor rules and free slot reuse')
+        node2 = self.aList.getById(222)
+        self.aList.delete(node2)
+        self.assertEqual(self.aList.getLabel(), 'node-3', 'cursor moved to next')
+        self.assertEqual(self.labels(), ['node-0', 'node-1', 'node-3'], 'node-2 gone')
+        self.assertIsNone(self.aList.getById(222), 'ID cleared')
+        reused = self.aList.addNode(label='node-2b', nodeId=2222)
+        self.assertEqual(reused.slot, node2.slot, 'freed slot reused')
+        self.assertEqual(len(self.aList.labels), 4, 'arrays did not grow')
+        self.aList.last()
+        self.aList.delete()
+        self.assertTrue(self.aList.atTail(), 'tail deleted, cursor at new tail')
+        self.assertEqual(self.labels(), ['node-0', 'node-1', 'node-2b'], 'order ok')
+        self.assertEqual([node.label for node in reversed(self.aList)],
+                         ['node-2b', 'node-1', 'node-0'], 'reverse order')
+        self.assertEqual([node.label for node in self.aList.iterFrom(self.aList.getById(111))],
+                         ['node-1', 'node-2b'], 'from node-1 on')
+        self.assertIsNone(self.aList.getById(None), 'no lookups by missing ID')
+        print('Deleting from an empty list does nothing')
+        empty = ArrayLinkList()
+        empty.addNode(label='only')
+        empty.delete()
+        self.assertIsNone(empty.delete(), 'nothing to delete')
+        self.assertEqual((len(empty), empty.head, empty.free), (0, -1, 0), 'links intact')
+        self.assertIsNone(empty.getById(None), 'freed slot not found')
+
+    def test_5_pickle(self):
+        print('TEST pickle: the arrays round trip')
+        copy = pickle.loads(pickle.dumps(self.aList))
+        self.assertEqual([node.label for node in copy], self.labels(), 'same nodes')
+
+    def test_6_saveList(self):
+        print('TEST ListTable.saveList: bulk save and reload')
+        if Path('test.db').exists():
+            os.remove('test.db')
+        db = Database('test.db')
+        table = ListTable(db, 'test_table')
+        # Like ListTable.save(), only nodes without an ID are inserted
+        for node in self.aList:
+            node.nodeId = None
+        table.saveList(self.aList)
+        self.assertEqual(db.getCount('test_table'), 4, 'head record plus 3 nodes')
+        self.assertIsNotNone(self.aList.first().nodeId, 'new node got an ID')
+        self.aList.first().label = 'node-0a'
+        table.saveList(self.aList)
+        self.assertEqual(db.getCount('test_table'), 4, 'second save only updates')
+        loaded = ArrayLinkList()
+        table.load(loaded)
+        self.assertEqual([node.label for node in loaded], self.labels(), 'reloaded in order')
+        self.assertEqual(loaded.first().label, 'node-0a', 'update saved')
+        db.close()
+
+    def test_Z_done(self):
+        print('----- ArrayLinkList test completed -----')
+
+
 class TestListOfLists(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -375,6 +604,16 @@ class TestListOfLists(TestCase):
         self.assertEqual(self.tList.getHeadId(), 21, 'list-2 head (child ID)  is node2-1')
         self.assertEqual(self.tList.getSublist().cursor, node23, 'list-2 @ node2-3')
 
+    def test_3_iterCells(self):
+        print('TEST iterCells: every cell, column by column')
+        self.tList.first()
+        cells = [(listNode.label, node.label) for listNode, node in self.tList.iterCells()]
+        self.assertEqual(len(cells), 9, '9 cells')
+        self.assertEqual(cells[0], ('list-3', 'node-31'), 'first cell')
+        self.assertEqual(cells[-1], ('list-2', 'node-23'), 'last cell')
+        self.assertEqual(self.tList.getLabel(), 'list-3', 'list cursor unchanged')
+        self.assertEqual(len(self.tList), 3, '3 lists')
+
     def test_Z_done(self):
         print('----- ListOfLists test completed -----')
 
@@ -441,6 +680,21 @@ class TestListTable(TestCase):
         self.assertEqual(l2.next().label, 'node-3', 'node-3 ok')
         self.assertEqual(l2.next().label, 'node-4', 'node-4 ok')
 
+    def test_6_loadChain(self):
+        print('TEST loadChain(): one query returns the chain in list order')
+        labels = [rec['label'] for rec in self.testTable.loadChain(self.n1.nodeId)]
+        self.assertEqual(labels, ['node-1', 'node-2', 'node-2.5', 'node-3', 'node-4'],
+                         'chain order ok')
+        self.assertEqual(self.testTable.loadChain(None), [], 'no head, no chain')
+        print('A corrupted (circular) chain still stops')
+        self.db.update(self.n4.nodeId, 'test_table', dict(nextId=self.n2.nodeId))
+        chain = self.testTable.loadChain(self.n1.nodeId)
+        self.assertLessEqual(len(chain), self.db.getCount('test_table'), 'loop stopped')
+        records = self.testTable.loadRecords()
+        walked = list(self.testTable.walk(records, self.n1.nodeId))
+        self.assertEqual(len(walked), len(records), 'walk stopped too')
+        self.db.update(self.n4.nodeId, 'test_table', dict(nextId=None))
+
     def test_Z_done(self):
         print('----- ListTable test completed -----')
 
@@ -513,6 +767,7 @@ class TestPersistentDoubleLinkList(TestCase):
         self.assertIsNone(node3.childId, "child ID None")
         self.assertIsNotNone(node3.sublist, 'node-3 sublist is not None')
         self.assertEqual(self.tpList.db.getCount('test_table'), 4, 'table has 3 nodes')
+        self.assertEqual(self.tpList.index.get(node3.nodeId), node3, 'node-3 indexed by ID')
 
     def test_3_load(self):
         print('TEST load(): check all nodes in a new list from the same table.')
@@ -524,6 +779,7 @@ class TestPersistentDoubleLinkList(TestCase):
         self.assertEqual(lp2.next().label, 'node-1', 'rec 2 is node-1, ok')
         self.assertEqual(lp2.next().label, 'node-2', 'rec 3 is node-2, ok')
         self.assertIsNone(lp2.next(), 'That was the last record')
+        self.assertEqual(lp2.getById(lp2.headId), lp2.head, 'loaded nodes are indexed')
 
     def test_Z_done(self):
         print('----- PersistentDoubleLinkList test completed -----')
@@ -696,6 +952,93 @@ class TestPersistentListOfLists(TestCase):
         print('----- PersistentListOfLists test completed -----')
 
 
+class TestWriteBehind(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if Path('test.db').exists():
+            os.remove('test.db')
+        cls.db = Database('test.db')
+
+    def test_1_flush(self):
+        print('**TestWriteBehind**')
+        print('TEST flush(): nothing is written until flushed')
+        pList = PersistentDoubleLinkList(self.db, 'flat_table', writeBehind=True)
+        node2 = pList.addNode(appendIt=True, label='node-2', childId=22)
+        pList.addNode(appendIt=True, label='node-3')
+        pList.first()
+        pList.addNode(label='node-1')
+        self.assertEqual(self.db.getCount('flat_table'), 1, 'only the head record')
+        self.assertEqual(len(pList.dirty), 3, '3 dirty nodes')
+        pList.flush()
+        self.assertEqual(self.db.getCount('flat_table'), 4, '3 nodes saved')
+        self.assertFalse(pList.dirty, 'nothing left dirty')
+        self.assertEqual(pList.getById(node2.nodeId), node2, 'new IDs indexed')
+        print('Reload matches, including the new head')
+        loaded = PersistentDoubleLinkList(self.db, 'flat_table')
+        self.assertEqual([node.label for node in loaded], ['node-1', 'node-2', 'node-3'],
+                         'order ok')
+        self.assertEqual(loaded.getById(node2.nodeId).childId, 22, 'data ok')
+
+    def test_2_threshold(self):
+        print('TEST flushThreshold: flushes itself when enough piles up')
+        pList = PersistentDoubleLinkList(self.db, 'flat_table', writeBehind=True,
+                                         flushThreshold=4)
+        for n in range(4):
+            pList.addNode(appendIt=True, label='more-' + str(n))
+        self.assertEqual(self.db.getCount('flat_table'), 7, 'auto-flushed 3 nodes')
+        pList.flush()
+        loaded = PersistentDoubleLinkList(self.db, 'flat_table')
+        self.assertEqual(len(loaded), 7, 'all 7 nodes chained')
+
+    def test_3_listOfLists(self):
+        print('TEST PersistentListOfLists write-behind, sublist heads included')
+        plList = PersistentListOfLists(self.db, 'grid_table', writeBehind=True,
+                                       flushThreshold=5)
+        for col in range(3):
+            plList.addList(appendIt=True, label='list-' + str(col))
+            for row in range(3):
+                plList.addNode(appendIt=True, label='node-{}{}'.format(col, row))
+        plList.first()
+        plList.getSublist().first()
+        plList.addNode(label='node-0-new-head')
+        plList.flush()
+        loaded = PersistentListOfLists(self.db, 'grid_table')
+        cells = [(listNode.label, node.label) for listNode, node in loaded.iterCells()]
+        self.assertEqual(len(cells), 10, '10 cells saved')
+        self.assertEqual(cells[0], ('list-0', 'node-0-new-head'), 'new sublist head')
+        self.assertEqual(cells[-1], ('list-2', 'node-22'), 'last cell')
+
+    def test_4_failure(self):
+        print('TEST flush(): a failed flush keeps everything dirty')
+        pList = PersistentDoubleLinkList(self.db, 'fail_table', writeBehind=True)
+        node1 = pList.addNode(appendIt=True, label='node-1')
+        node2 = pList.addNode(appendIt=True, label='node-2')
+        updateMany = self.db.updateMany
+
+        def failing(*_args):
+            raise sqlite3.OperationalError('disk I/O error')
+
+        self.db.updateMany = failing
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                pList.flush()
+        finally:
+            self.db.updateMany = updateMany
+        self.assertEqual(self.db.getCount('fail_table'), 1, 'inserts rolled back')
+        self.assertEqual(len(pList.dirty), 2, 'still dirty')
+        self.assertTrue(pList.headDirty, 'head still dirty')
+        self.assertIsNone(node1.nodeId, 'unsaved ID taken back')
+        self.assertEqual(pList.index, {}, 'nothing indexed')
+        pList.flush()
+        loaded = PersistentDoubleLinkList(self.db, 'fail_table')
+        self.assertEqual([node.label for node in loaded], ['node-1', 'node-2'], 'saved on retry')
+        self.assertEqual(pList.getById(node2.nodeId), node2, 'new IDs indexed')
+
+    def test_Z_done(self):
+        self.db.close()
+        print('----- WriteBehind test completed -----')
+
+
 if __name__ == '__main__':
     # begin the unittest.main()
     unittest.main()
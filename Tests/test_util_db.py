@@ -0,0 +1,289 @@
+# test_util_db.py
+# A set of unit tests for util_db.py code.
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Same conventions as test_util_container.py: tests are numbered
+#     (test_X_methodname) since some rely on data left by preceding tests.
+import asyncio
+import os
+import sqlite3
+import unittest
+from pathlib import Path
+from threading import Thread
+from unittest import TestCase
+
+from Util.util_db import AsyncDatabase, Database
+
+
+class TestConnectionPool(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if Path('test.db').exists():
+            os.remove('test.db')
+        cls.db = Database('test.db', poolSize=2)
+        cls.db.createTable('test_table', 'id integer PRIMARY KEY, label text')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def test_1_connect(self):
+        print('**TestConnectionPool**')
+        print('TEST connect(): same thread reuses one warm connection')
+        conn1, curs1 = self.db.connect()
+        conn2, curs2 = self.db.connect()
+        self.assertIs(conn1, conn2, 'same connection for the same thread')
+        curs1.close()
+        curs2.close()
+        for n in range(100):
+            self.db.insert('test_table', dict(label='row-' + str(n)))
+        self.assertEqual(self.db.getCount('test_table'), 100, '100 rows inserted')
+        self.assertEqual(self.db.pool.count(), 1, 'still only one connection open')
+
+    def test_2_threads(self):
+        print('TEST acquire(): each thread gets its own connection')
+        found = []
+
+        def worker():
+            conn, curs = self.db.connect()
+            found.append(conn)
+            curs.close()
+            self.db.pool.release()
+
+        thread = Thread(target=worker)
+        thread.start()
+        thread.join()
+        mine, curs = self.db.connect()
+        curs.close()
+        self.assertIsNot(found[0], mine, 'worker used a different connection')
+        self.assertEqual(self.db.pool.count(), 2, 'released connection kept idle')
+        print('Released connection is reused by the next thread')
+        thread = Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertIs(found[1], found[0], 'idle connection recycled')
+
+    def test_3_leaks(self):
+        print('TEST leak detection: a thread exits without releasing')
+        thread = Thread(target=self.db.connect)
+        thread.start()
+        thread.join()
+        with self.assertWarns(ResourceWarning):
+            thread = Thread(target=self.db.getCount, args=('test_table',))
+            thread.start()
+            thread.join()
+        self.assertEqual(self.db.pool.leaks, 1, 'one leaked connection reclaimed')
+        self.assertEqual(self.db.pool.count(), 2, 'pool never exceeded its size')
+
+    def test_4_profile(self):
+        print('TEST profile: pragmas applied to each new connection')
+        with Database('test.db', profile='interactive') as db:
+            self.assertEqual(db.query('PRAGMA journal_mode')[0][0], 'wal', 'WAL')
+            self.assertEqual(db.query('PRAGMA synchronous')[0][0], 1, 'NORMAL')
+            self.assertEqual(db.query('PRAGMA temp_store')[0][0], 2, 'MEMORY')
+            self.assertEqual(db.getCount('test_table'), 100, 'data visible')
+        with Database('test.db', profile=[('journal_mode', 'DELETE')]) as db:
+            self.assertEqual(db.query('PRAGMA journal_mode')[0][0], 'delete', 'own pragmas')
+        with self.assertRaises(ValueError):
+            Database('test.db', profile='fastest')
+
+    def test_5_close(self):
+        print('TEST close(): context manager closes the pool')
+        with Database('test.db') as db:
+            self.assertEqual(db.getCount('test_table'), 100, 'data visible')
+        self.assertTrue(db.pool.closed, 'pool closed on exit')
+        with self.assertRaises(sqlite3.ProgrammingError):
+            db.getCount('test_table')
+
+    def test_Z_done(self):
+        print('----- ConnectionPool test completed -----')
+
+
+class TestBulkWrites(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if Path('test.db').exists():
+            os.remove('test.db')
+        cls.db = Database('test.db')
+        cls.db.createTable('test_table', 'id integer PRIMARY KEY, nextId integer, label text')
+        cls.newIds = []
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def test_1_insertMany(self):
+        print('**TestBulkWrites**')
+        print('TEST insertMany(): mixed column sets keep row order for new IDs')
+        self.db.insert('test_table', dict(label='first'))
+        rows = [dict(label='a'), dict(nextId=None, label='b'), dict(label='c'),
+                dict(nextId=None, label='d')]
+        self.newIds.extend(self.db.insertMany('test_table', rows))
+        self.assertEqual(len(self.newIds), 4, 'one ID per row')
+        self.assertEqual(len(set(self.newIds)), 4, 'IDs are unique')
+        for newId, row in zip(self.newIds, rows):
+            rec = self.db.selectById('test_table', newId)
+            self.assertEqual(rec['label'], row['label'], 'ID matches its row')
+        print('Explicit primary keys are honored')
+        ids = self.db.insertMany('test_table', [dict(id=100, label='x'), dict(label='y')])
+        self.assertEqual(ids[0], 100, 'explicit ID returned')
+        self.assertEqual(self.db.selectById('test_table', ids[1])['label'], 'y', 'y saved')
+
+    def test_2_updateMany(self):
+        print('TEST updateMany(): chain the new rows together in one commit')
+        rows = []
+        for n, newId in enumerate(self.newIds):
+            nextId = self.newIds[n + 1] if n + 1 < len(self.newIds) else None
+            rows.append((newId, dict(nextId=nextId)))
+        rows.append((self.newIds[0], dict(nextId=self.newIds[1], label='a2')))
+        self.db.updateMany('test_table', rows)
+        rec = self.db.selectById('test_table', self.newIds[0])
+        self.assertEqual(rec['nextId'], self.newIds[1], 'a points to b')
+        self.assertEqual(rec['label'], 'a2', 'a relabeled')
+        self.assertIsNone(self.db.selectById('test_table', self.newIds[3])['nextId'],
+                          'd is the tail')
+
+    def test_3_rollback(self):
+        print('TEST insertMany(): a failing row rolls back the whole batch')
+        count = self.db.getCount('test_table')
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.insertMany('test_table', [dict(label='ok'), dict(bogus='bad')])
+        self.assertEqual(self.db.getCount('test_table'), count, 'nothing inserted')
+
+    def test_Z_done(self):
+        print('----- BulkWrites test completed -----')
+
+
+class TestTransaction(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if Path('test.db').exists():
+            os.remove('test.db')
+        cls.db = Database('test.db')
+        cls.db.createTable('test_table', 'id integer PRIMARY KEY, label text')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def test_1_commit(self):
+        print('**TestTransaction**')
+        print('TEST transaction(): writes are invisible to others until commit')
+        other = Database('test.db')
+        with self.db.transaction():
+            self.db.insert('test_table', dict(label='a'))
+            self.db.insert('test_table', dict(label='b'))
+            self.assertEqual(other.getCount('test_table'), 0, 'not committed yet')
+        self.assertEqual(other.getCount('test_table'), 2, 'both committed together')
+        other.close()
+
+    def test_2_rollback(self):
+        print('TEST transaction(): an exception rolls back every write')
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.insert('test_table', dict(label='c'))
+                raise ValueError('abort')
+        self.assertEqual(self.db.getCount('test_table'), 2, 'c rolled back')
+
+    def test_3_nested(self):
+        print('TEST transaction(): nested blocks roll back to their savepoint')
+        with self.db.transaction():
+            self.db.insert('test_table', dict(label='d'))
+            try:
+                with self.db.transaction():
+                    self.db.insert('test_table', dict(label='e'))
+                    raise ValueError('abort inner')
+            except ValueError:
+                pass
+            newIds = self.db.insertMany('test_table', [dict(label='f'), dict(label='g')])
+        self.assertEqual(self.db.getCount('test_table'), 5, 'd, f and g kept; e undone')
+        self.assertEqual(self.db.selectById('test_table', newIds[1])['label'], 'g', 'g ok')
+
+    def test_Z_done(self):
+        print('----- Transaction test completed -----')
+
+
+class TestAsyncDatabase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if Path('test.db').exists():
+            os.remove('test.db')
+        cls.db = AsyncDatabase('test.db', queueSize=4)
+        cls.db.db.createTable('test_table', 'id integer PRIMARY KEY, label text')
+
+    @classmethod
+    def tearDownClass(cls):
+        if not cls.db.closed:
+            asyncio.run(cls.db.close())
+        if Path('test_backup.db').exists():
+            os.remove('test_backup.db')
+
+    def test_1_insert(self):
+        print('**TestAsyncDatabase**')
+        print('TEST insert(), selectById(): awaited writes, then reads')
+
+        async def run():
+            newId = await self.db.insert('test_table', dict(label='a'))
+            await self.db.update(newId, 'test_table', dict(label='a2'))
+            return newId, await self.db.selectById('test_table', newId)
+
+        newId, rec = asyncio.run(run())
+        self.assertEqual(rec['label'], 'a2', 'updated')
+        self.assertEqual(self.db.stats()['writes'], 2, 'two writes')
+
+    def test_2_backpressure(self):
+        print('TEST write(): a full queue makes writers wait, batches commit together')
+
+        async def run():
+            return await asyncio.gather(
+                *[self.db.insert('test_table', dict(label='row-' + str(n))) for n in range(50)])
+
+        newIds = asyncio.run(run())
+        self.assertEqual(len(set(newIds)), 50, '50 new IDs')
+        stats = self.db.stats()
+        self.assertGreater(stats['waits'], 0, 'some writes waited')
+        self.assertLessEqual(stats['maxDepth'], 4, 'queue stayed bounded')
+        self.assertLess(stats['commits'], stats['writes'], 'writes shared commits')
+
+    def test_3_errors(self):
+        print('TEST write(): one failing write leaves its batch-mates alone')
+
+        async def run():
+            return await asyncio.gather(self.db.insert('test_table', dict(label='ok')),
+                                        self.db.insert('test_table', dict(bogus='bad')),
+                                        return_exceptions=True)
+
+        good, bad = asyncio.run(run())
+        self.assertIsInstance(bad, sqlite3.OperationalError, 'error passed back')
+        self.assertEqual(asyncio.run(self.db.getCount('test_table')), 52, 'ok kept')
+
+    def test_4_delete(self):
+        print('TEST delete(), getIds(), backup(): the rest of the API')
+
+        async def run():
+            ids = await self.db.getIds('test_table')
+            await asyncio.gather(*[self.db.delete('test_table', idNum) for idNum in ids[:10]])
+            await self.db.backup('test_backup.db')
+            return await self.db.getIds('test_table')
+
+        self.assertEqual(len(asyncio.run(run())), 42, '10 deleted')
+        with Database('test_backup.db') as backup:
+            self.assertEqual(backup.getCount('test_table'), 42, 'backed up')
+
+    def test_5_close(self):
+        print('TEST close(): WAL by default, and no writes once closed')
+        self.assertEqual(asyncio.run(self.db.query('PRAGMA journal_mode'))[0][0], 'wal',
+                         'interactive profile')
+        asyncio.run(self.db.close())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            asyncio.run(self.db.insert('test_table', dict(label='late')))
+
+    def test_Z_done(self):
+        print('----- AsyncDatabase test completed -----')
+
+
+if __name__ == '__main__':
+    unittest.main()
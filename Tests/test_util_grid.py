@@ -0,0 +1,241 @@
+# test_util_grid.py
+# A set of unit tests for util_grid.py code.
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Same conventions as test_util_container.py: tests are numbered
+#     (test_X_methodname) since some rely on data left by preceding tests.
+import unittest
+from unittest import TestCase
+
+from Util.globals import MOVEPUSH, MOVESWAP, WIDGETHEIGHT, WIDGETWIDTH, DESKTOPPADX, DESKTOPPADY
+from Util.util_grid import GridIndex, GridModel, Selection
+
+
+class TestGridIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = GridIndex()
+
+    def test_1_put(self):
+        print('**TestGridIndex**')
+        print('TEST put(): items by position, past the old 999 limit')
+        for row in range(5):
+            for col in range(0, 10, 2):
+                self.grid.put(row, col, 'item-{}-{}'.format(row, col))
+        self.grid.put(1500, 2000, 'far away')
+        self.assertEqual(len(self.grid), 26, '26 items')
+        self.assertEqual(self.grid.get(1500, 2000), 'far away', 'big positions ok')
+        self.grid.put(1500, 2000, 'replaced')
+        self.assertEqual(len(self.grid), 26, 'replacing adds nothing')
+        self.assertEqual(self.grid.get(1500, 2000), 'replaced', 'item replaced')
+        self.assertIsNone(self.grid.get(0, 1), 'empty cell')
+        self.assertIn((2, 4), self.grid, 'contains position')
+
+    def test_2_rect(self):
+        print('TEST rect(): items in a rectangle, row by row')
+        found = [position for position, _ in self.grid.rect(1, 2, 2, 5)]
+        self.assertEqual(found, [(1, 2), (1, 4), (2, 2), (2, 4)], 'inner block')
+        found = list(self.grid.rect(10, 0, 20, 50))
+        self.assertEqual(found, [], 'empty block')
+        found = [position for position, _ in self.grid.rect(4, 8)]
+        self.assertEqual(found, [(4, 8), (1500, 2000)], 'unbounded bottom right')
+        self.assertEqual(list(self.grid.row(3, 5)), ['item-3-6', 'item-3-8'], 'row')
+        self.assertEqual(list(self.grid.column(8, 3, 4)), ['item-3-8', 'item-4-8'],
+                         'column')
+
+    def test_3_firstFree(self):
+        print('TEST firstFree(): first empty cell in row-major order')
+        self.assertEqual(self.grid.firstFree(), (0, 1), 'gap in row 0')
+        self.grid.put(0, 1, 'filler')
+        self.assertEqual(self.grid.firstFree(), (0, 3), 'next gap in row 0')
+        for col in range(10):
+            self.grid.put(0, col, 'filler')
+        self.assertEqual(self.grid.firstFree(), (0, 10), 'unbounded width')
+        self.assertEqual(self.grid.firstFree(width=10), (1, 1), 'wraps to row 1')
+        self.assertEqual(self.grid.firstFree(5, 0, width=10), (5, 0), 'empty row')
+
+    def test_4_pop(self):
+        print('TEST pop(): remove items and their empty rows and columns')
+        self.assertEqual(self.grid.pop(1500, 2000), 'replaced', 'popped')
+        self.assertNotIn(1500, self.grid.rows, 'empty row dropped')
+        self.assertNotIn(2000, self.grid.colKeys, 'empty column dropped')
+        with self.assertRaises(KeyError):
+            self.grid.pop(1500, 2000)
+        self.grid.pop(2, 4)
+        found = [position for position, _ in self.grid.rect(2, 3, 2, 5)]
+        self.assertEqual(found, [], 'cell gone from rectangle queries')
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0, 'cleared')
+        self.assertEqual(self.grid.firstFree(), (0, 0), 'all free')
+
+    def test_5_planMove(self):
+        print('TEST planMove(): whole-group moves, with collision policies')
+        self.grid.clear()
+        for col in range(4):
+            self.grid.put(0, col, 'item-' + str(col))
+        self.grid.put(1, 2, 'below')
+        moves = self.grid.planMove([(0, 0), (0, 1)], cols=1)
+        self.assertIsNone(moves, 'item-2 is in the way')
+        moves = self.grid.planMove([(0, 2), (0, 3)], cols=-1, policy=MOVESWAP)
+        self.assertEqual(sorted(moves), [((0, 1), (0, 3)), ((0, 2), (0, 1)), ((0, 3), (0, 2))],
+                         'item-1 swaps to the vacated end')
+        moves = self.grid.planMove([(0, 0)], rows=1, cols=2, policy=MOVEPUSH, height=3)
+        self.assertEqual(sorted(moves), [((0, 0), (1, 2)), ((1, 2), (2, 4))],
+                         'below pushed along')
+        self.assertIsNone(self.grid.planMove([(0, 0)], rows=1, cols=2, policy=MOVEPUSH,
+                                             height=2), 'pushed off the grid')
+        self.assertIsNone(self.grid.planMove([(0, 0)], cols=-1, policy=MOVEPUSH),
+                          'off the left edge')
+
+    def test_6_applyMoves(self):
+        print('TEST applyMoves(): overlapping moves land together')
+        moves = self.grid.planMove([(0, 0), (0, 1), (0, 2), (0, 3)], cols=1)
+        items = self.grid.applyMoves(moves)
+        self.assertEqual(len(items), 4, '4 items moved')
+        self.assertEqual(list(self.grid.row(0)), ['item-0', 'item-1', 'item-2', 'item-3'],
+                         'order kept')
+        self.assertIsNone(self.grid.get(0, 0), 'first cell empty')
+        self.assertEqual(self.grid.firstFree(), (0, 0), 'first cell free')
+
+    def test_Z_done(self):
+        print('----- GridIndex test completed -----')
+
+
+class FakeWidget:
+    """ Just enough of a WidgetFrame for Selection and GridModel. """
+
+    def __init__(self, row, col):
+        self.row = row
+        self.col = col
+
+    def getPosition(self):
+        return self.row, self.col
+
+    def setPosition(self, row, col, save=True):
+        self.row = row
+        self.col = col
+
+
+class TestSelection(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.selection = Selection(None)
+        cls.widgets = {(row, col): FakeWidget(row, col) for row in range(3) for col in range(3)}
+
+    def test_1_add(self):
+        print('**TestSelection**')
+        print('TEST add(): extents grow, row and column 0 included')
+        self.selection.add(self.widgets[1, 1])
+        self.assertEqual(self.selection.getExtents(), (1, 1, 1, 1), 'one widget')
+        self.assertIs(self.selection.getOrigin(), self.widgets[1, 1], 'origin')
+        self.selection.add(self.widgets[2, 0])
+        self.assertEqual(self.selection.getExtents(), (1, 0, 2, 1), 'column 0')
+        self.assertIs(self.selection.getOrigin(), self.widgets[1, 1],
+                      'corner is empty, last origin kept')
+        self.selection.add(self.widgets[0, 0])
+        self.selection.add(self.widgets[0, 0])
+        self.assertEqual(self.selection.count(), 3, 'added once')
+        self.assertEqual(self.selection.getExtents(), (0, 0, 2, 1), 'row 0')
+        self.assertIs(self.selection.getOrigin(), self.widgets[0, 0], 'new origin')
+
+    def test_2_remove(self):
+        print('TEST remove(): boundary widgets shrink the extents')
+        self.selection.remove(self.widgets[1, 1])
+        self.assertEqual(self.selection.getExtents(), (0, 0, 2, 0), 'right edge moved')
+        self.selection.remove(self.widgets[0, 0])
+        self.assertEqual(self.selection.getExtents(), (2, 0, 2, 0), 'top edge moved')
+        self.assertIs(self.selection.getOrigin(), self.widgets[2, 0], 'origin found')
+        self.selection.add(self.widgets[0, 2])
+        self.assertIs(self.selection.getOrigin(), self.widgets[2, 0], 'anchor kept')
+        self.assertFalse(self.selection.contains(self.widgets[0, 0]), 'removed')
+        self.assertEqual(list(self.selection.items), [self.widgets[2, 0], self.widgets[0, 2]],
+                         'left over')
+        self.selection.clear()
+        self.assertEqual(self.selection.getExtents(), (None, None, None, None), 'cleared')
+
+    def test_Z_done(self):
+        print('----- Selection test completed -----')
+
+
+class TestGridModel(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model = GridModel(rows=5, cols=5)
+        for row in range(3):
+            for col in range(3):
+                cls.model.put(FakeWidget(row, col))
+
+    def test_1_geometry(self):
+        print('**TestGridModel**')
+        print('TEST gridPosition(), viewPosition(): round trip')
+        x, y = self.model.viewPosition(2, 3)
+        self.assertEqual(self.model.gridPosition(x + 1, y + 1), (2, 3), 'same cell')
+        self.assertEqual(self.model.viewSize(), (5 * (WIDGETHEIGHT + DESKTOPPADY) + DESKTOPPADY,
+                                                 5 * (WIDGETWIDTH + DESKTOPPADX) + DESKTOPPADX),
+                         'view size')
+
+    def test_2_selectRange(self):
+        print('TEST selectRange(): reports what got unselected')
+        self.assertEqual(self.model.selectRange(0, 0, 1, 1), [], 'nothing before')
+        self.assertEqual(self.model.selection.count(), 4, '2x2 block')
+        unselected = self.model.selectRange(1, 1)
+        self.assertEqual(sorted(item.getPosition() for item in unselected),
+                         [(0, 0), (0, 1), (1, 0)], 'block minus overlap')
+        self.assertEqual(self.model.selection.count(), 4, 'to the grid edges')
+
+    def test_3_move(self):
+        print('TEST move(): selection moves, blocked moves change nothing')
+        self.assertIsNone(self.model.move(cols=-1), 'blocked by column 0')
+        self.assertIsNone(self.model.move(rows=3), 'off the bottom')
+        moved = self.model.move(rows=2, cols=2)
+        self.assertEqual(len(moved), 4, '4 moved')
+        self.assertEqual(self.model.selection.getExtents(), (3, 3, 4, 4), 'new extents')
+        self.assertIsNone(self.model.cells.get(1, 1), 'old cell empty')
+
+    def test_4_insertRows(self):
+        print('TEST insertRows(), insertColumns(): grow the grid, shift items')
+        moved = self.model.insertRows(1, 2)
+        self.assertEqual(self.model.gridRows, 7, '2 rows added')
+        self.assertEqual(len(moved), 6, 'rows 1 and down moved')
+        self.assertIsNotNone(self.model.cells.get(3, 0), 'row 1 now row 3')
+        moved = self.model.insertColumns(4)
+        self.assertEqual(self.model.gridCols, 6, '1 column added')
+        self.assertEqual(len(moved), 2, 'column 4 moved')
+        self.assertEqual(self.model.selection.getExtents(), (5, 3, 6, 5), 'still selected')
+        self.assertEqual(len(self.model.selectAll(False)), 4, '4 unselected')
+
+    def test_5_oldSetPosition(self):
+        print('TEST shift(): setPosition(row, col) overrides without save still work')
+
+        class OldWidget(FakeWidget):
+            saves = 0
+
+            def setPosition(self, row, col):
+                self.row, self.col = row, col
+                OldWidget.saves += 1
+
+        model = GridModel(rows=3, cols=3)
+        model.put(OldWidget(0, 0))
+        model.selectAll()
+        self.assertEqual(len(model.move(cols=1)), 1, 'moved')
+        self.assertEqual(OldWidget.saves, 1, 'saved itself')
+
+    def test_6_insertBlocked(self):
+        print('TEST insertColumns(): a blocked shift leaves the grid size alone')
+        model = GridModel(rows=3, cols=3)
+        model.put(FakeWidget(0, 1))
+        model.put(FakeWidget(0, 5))
+        self.assertIsNone(model.insertColumns(0), 'pushed off the grid')
+        self.assertEqual(model.gridCols, 3, 'no column added')
+        self.assertIsNone(model.insertRows(0, 3), 'no room below either')
+        self.assertEqual(model.gridRows, 3, 'no row added')
+
+    def test_Z_done(self):
+        print('----- GridModel test completed -----')
+
+
+if __name__ == '__main__':
+    unittest.main()
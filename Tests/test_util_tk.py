@@ -0,0 +1,176 @@
+# test_util_tk.py
+# A set of unit tests for util_tk.py code.
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+# 2021.04.15
+#
+# Notes:
+#   - Same conventions as test_util_container.py: tests are numbered
+#     (test_X_methodname) since some rely on data left by preceding tests.
+#   - Widget tests need a display, and are skipped without one.
+import unittest
+from concurrent.futures import Future
+from tkinter import TclError, Tk
+from unittest import TestCase
+
+from Util import util_tk
+from Util.util_tk import DraggableFrame, TkPollTimer
+
+
+class TestDraggableFrame(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.root = Tk()
+        except TclError:
+            raise unittest.SkipTest('no display')
+        cls.root.geometry('300x300')
+        cls.frame = DraggableFrame(cls.root, width=50, height=50)
+        cls.frame.place(x=10, y=10)
+        cls.root.update()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.root.destroy()
+
+    def test_1_dragFps(self):
+        print('**TestDraggableFrame**')
+        print('TEST dragFps: must be positive')
+        with self.assertRaises(ValueError):
+            self.frame.dragFps = 0
+        self.frame.dragFps = 30
+        self.assertEqual(self.frame.dragFps, 30, 'set')
+
+    def test_2_dropBareFrame(self):
+        print('TEST onDragStop(): a drag on the frame itself cleans up on drop')
+        self.frame.dragGhost = True
+        self.frame.event_generate('<Button-1>', x=5, y=5)
+        self.frame.event_generate('<B1-Motion>', x=25, y=25)
+        self.assertIsNotNone(self.frame.dragPending, 'motion waits for the next frame')
+        self.frame.event_generate('<ButtonRelease-1>', x=25, y=25)
+        self.assertIsNone(self.frame.dragPending, 'nothing pending')
+        self.assertEqual(self.root.tk.splitlist(self.root.tk.call('after', 'info')), (),
+                         'no after() calls left')
+        self.assertIsNone(self.frame.ghost, 'ghost removed')
+        self.assertFalse(self.frame.dragInProgess, 'drag over')
+
+    def test_Z_done(self):
+        print('----- DraggableFrame test completed -----')
+
+
+class FakeTk:
+    """ Just enough of a widget (after(), after_cancel()) and of the time
+        module (monotonic()) for TkPollTimer, on a clock the test moves. """
+
+    def __init__(self):
+        self.now = 0.0
+        self.pending = {}
+        self.lastId = 0
+
+    def advance(self, seconds):
+        """ Move the clock on, running after() calls as they come due. """
+        end = self.now + seconds
+        while self.pending:
+            afterId = min(self.pending, key=lambda key: self.pending[key][0])
+            due, func = self.pending[afterId]
+            if due > end:
+                break
+            del self.pending[afterId]
+            self.now = max(self.now, due)
+            func()
+        self.now = end
+
+    def after(self, ms, func):
+        self.lastId += 1
+        self.pending[self.lastId] = (self.now + ms / 1000, func)
+        return self.lastId
+
+    def after_cancel(self, afterId):
+        del self.pending[afterId]
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeExecutor:
+    """ Hands out futures the test completes itself. """
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, func, *args, **kwargs):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+
+class TestTkPollTimer(TestCase):
+    def setUp(self):
+        self.tk = FakeTk()
+        self.oldTime = util_tk.time
+        util_tk.time = self.tk
+
+    def tearDown(self):
+        util_tk.time = self.oldTime
+
+    def test_1_beat(self):
+        print('**TestTkPollTimer**')
+        print('TEST tick(): keeps to the beat, skipping ticks missed while held up')
+        ticks = []
+
+        def slowSave():
+            ticks.append(self.tk.now)
+            if len(ticks) == 2:
+                # Hold up the Tk thread for 2.5 ticks
+                self.tk.now += 2.5
+
+        with self.assertRaises(ValueError):
+            TkPollTimer(self.tk, 0, slowSave)
+        timer = TkPollTimer(self.tk, 1 / 60, slowSave)
+        timer.start()
+        self.tk.advance(6.5)
+        self.assertEqual(ticks, [1.0, 2.0, 5.0, 6.0], 'late ticks dropped, beat kept')
+        self.assertEqual(timer.skipped, 2, 'ticks 3 and 4 skipped')
+        timer.cancel()
+        self.assertEqual(self.tk.pending, {}, 'nothing left scheduled')
+
+    def test_2_executor(self):
+        print('TEST pollResult(): background runs never overlap, results come back')
+        executor = FakeExecutor()
+        results = []
+        timer = TkPollTimer(self.tk, 1 / 60, None, executor=executor, done=results.append)
+        timer.start()
+        self.tk.advance(3.5)
+        self.assertEqual(len(executor.futures), 1, 'one run in flight')
+        self.assertEqual(timer.skipped, 2, 'ticks skipped meanwhile')
+        executor.futures[0].set_result('saved')
+        self.tk.advance(0.1)
+        self.assertEqual(results, ['saved'], 'result passed on')
+        self.assertEqual(timer.runs, 1, 'one run')
+        self.tk.advance(1)
+        self.assertEqual(len(executor.futures), 2, 'next tick runs')
+
+    def test_3_cancel(self):
+        print('TEST cancel(): stops the ticks and the result polling')
+        executor = FakeExecutor()
+        results = []
+        timer = TkPollTimer(self.tk, 1 / 60, None, executor=executor, done=results.append)
+        timer.start()
+        self.tk.advance(1.01)
+        self.assertIsNotNone(timer.pollId, 'polling for the result')
+        timer.cancel()
+        self.assertEqual(self.tk.pending, {}, 'nothing left scheduled')
+        self.assertTrue(executor.futures[0].cancelled(), 'unstarted run cancelled')
+        self.tk.advance(3)
+        self.assertEqual(results, [], 'nothing reported')
+        print('A timer can cancel itself from its own callback')
+        timer = TkPollTimer(self.tk, 1 / 60, lambda: timer.cancel())
+        timer.start()
+        self.tk.advance(3)
+        self.assertEqual((timer.runs, self.tk.pending), (1, {}), 'ran once')
+
+    def test_Z_done(self):
+        print('----- TkPollTimer test completed -----')
+
+
+if __name__ == '__main__':
+    unittest.main()
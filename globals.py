@@ -10,6 +10,22 @@
 APPDIMENSIONS = '1200x900'
 RECENTFILEMAX = 9
 
+# Persistent list (util_container.py) defaults
+FLUSHTHRESHOLD = 500
+
+# Database (util_db.py) defaults
+DBPOOLSIZE = 5
+DBPOOLTIMEOUT = 10.0
+DBSTATEMENTCACHE = 128
+# Database pragma profiles (see util_db.PRAGMAPROFILES)
+DBINTERACTIVE = 'interactive'
+DBBULKLOAD = 'bulk-load'
+DBDURABLE = 'durable'
+# AsyncDatabase reader threads, queued writes allowed, and writes per commit
+DBREADERS = 2
+DBWRITEQUEUE = 256
+DBWRITEBATCH = 100
+
 # String formatting
 DBDATEFORMAT = '%Y-%m-%d %H:%M:%S'
 GEOMETRYFORMAT = '{0}x{1}+{2}+{3}'
@@ -20,6 +36,16 @@ CFG_GENERAL = 'general'
 CFG_GEOM = 'geometry'
 CFG_LASTPATH = 'last_path'
 CFG_RECENT = 'recent_files'
+# Seconds to wait for more changes before writing the config file
+CFGDEBOUNCE = 2.0
+# Seconds between checks for changes made to the config file elsewhere
+CFGSTATINTERVAL = 1.0
+
+# Drag and drop (util_tk.py) defaults
+DRAGFPS = 60
+GHOSTCOLOR = 'cyan'
+# Milliseconds between TkPollTimer checks for a background run's result
+TKPOLLMS = 50
 
 # Widget/desktop (util_tkgrid.py) defaults
 GRIDROWS = 10
@@ -29,6 +55,22 @@ WIDGETWIDTH = 200
 DESKTOPBG = '#333333'
 DESKTOPPADX = 15
 DESKTOPPADY = 15
+DESKTOPOVERSCAN = 2
+CARDOUTLINE = 'black'
+CARDHILIGHT = 'cyan'
+CARDTEXTPAD = 6
+
+# Desktop zoom (util_tkgrid.py) level-of-detail tiers, and the lowest zoom for each
+LODBLOCKS = 'blocks'
+LODLABELS = 'labels'
+LODFULL = 'full'
+ZOOMLABELS = 0.5
+ZOOMFULL = 1.0
+
+# Grid move (util_grid.py) policies, for cells already taken
+MOVEREJECT = 'reject'
+MOVESWAP = 'swap'
+MOVEPUSH = 'push'
 
 # Constant literals
 NEWPROJECT = 'New Project'
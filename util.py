@@ -5,8 +5,15 @@
 # 2020.05.23 - 2020.06.07
 #
 # Notes:
+#   - Periodic jobs (PollTimer included) share one Scheduler worker thread,
+#     so their callbacks run one at a time and should be kept short.
+import heapq
+import itertools
 import os
-from threading import Timer
+import random
+import time
+import traceback
+from threading import Condition, Thread, current_thread
 
 
 # Numbers .....................................................................
@@ -50,8 +57,80 @@ def prettyPath(path):
 
 # Classes .....................................................................
 
-class PollTimer(object):
-    """ Repeating timer that calls a function every <interval> minutes.
+class Job:
+    """ A function called every <interval> seconds by a Scheduler.
+        Fixed-rate jobs keep to the original beat (ticks missed while a run
+        overruns are skipped and counted); fixed-delay jobs wait <interval>
+        after each run ends. Up to <jitter> random seconds are added to each
+        tick so jobs started together don't always run together. """
+
+    def __init__(self, scheduler, interval, func, *args, fixedRate=True, jitter=0.0,
+                 **kwargs):
+        if interval <= 0:
+            raise ValueError('Job interval must be positive, not {}'.format(interval))
+        self.scheduler = scheduler
+        self.interval = interval
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.fixedRate = fixedRate
+        self.jitter = jitter
+        # The un-jittered time of the next tick, and our entry in the queue
+        self.base = None
+        self.entry = None
+        self.runs = 0
+        self.overruns = 0
+
+    def cancel(self):
+        """ Stop calling the function; a run already going finishes. """
+        self.scheduler.unschedule(self)
+
+    def isActive(self):
+        """ True if the job is waiting for (or running) a tick. """
+        return self.entry is not None
+
+    def pause(self):
+        """ Stop calling the function until resume(). """
+        self.scheduler.unschedule(self)
+
+    def resume(self):
+        """ Start ticking again, an interval from now. """
+        if not self.isActive():
+            self.start()
+
+    def run(self, entry):
+        """ Called by the scheduler: call the function, then book the next tick. """
+        started = time.monotonic()
+        try:
+            self.func(*self.args, **self.kwargs)
+        except Exception:
+            # Report it like a thread would, but keep the scheduler going
+            traceback.print_exc()
+        self.runs += 1
+        now = time.monotonic()
+        if self.fixedRate:
+            self.base += self.interval
+            if now > self.base:
+                missed = int((now - self.base) // self.interval) + 1
+                self.overruns += missed
+                self.base += missed * self.interval
+        else:
+            if now - started > self.interval:
+                self.overruns += 1
+            self.base = now + self.interval
+        self.scheduler.schedule(self, entry)
+
+    def start(self):
+        """ Start the job; the first call comes an interval from now. """
+        self.base = time.monotonic() + self.interval
+        self.scheduler.schedule(self)
+
+
+class PollTimer(Job):
+    """ Repeating timer that calls a function every <interval> minutes, on the
+    shared scheduler (see Job for options such as fixedRate and jitter).
+    func runs on the scheduler thread: use util_tk.TkPollTimer for anything
+    that touches Tk widgets.
     Usage:
         # Start an auto-save timer
         self.saveTimer = PollTimer(self.saveInterval, self.onSaveTimer)
@@ -63,25 +142,101 @@ class PollTimer(object):
     """
 
     def __init__(self, interval, func, *args, **kwargs):
-        self.interval = interval * 60
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-        self.timer = None
+        super().__init__(getScheduler(), interval * 60, func, *args, **kwargs)
 
-    def callback(self):
-        """ Call the callback function, then restart the timer. """
-        self.func(*self.args, **self.kwargs)
-        self.start()
 
-    def cancel(self):
-        """ Shut down the poll timer. """
-        self.timer.cancel()
+class Scheduler:
+    """ Runs any number of periodic jobs from one worker thread, using a heap
+        of (due time, entry, job), so idle jobs cost no threads at all. """
 
-    def start(self):
-        """ Start the poll timer. """
-        self.timer = Timer(self.interval, self.callback)
-        self.timer.start()
+    def __init__(self):
+        self.queue = []
+        self.entries = itertools.count()
+        self.condition = Condition()
+        self.thread = None
+        self.stopping = False
+
+    def every(self, interval, func, *args, **kwargs):
+        """ Create and start a Job calling func every <interval> seconds. """
+        job = Job(self, interval, func, *args, **kwargs)
+        job.start()
+        return job
+
+    def schedule(self, job, after=None):
+        """ Queue the job's next tick. Passing the entry it just ran from
+            (after) skips it if it was paused or cancelled meanwhile. """
+        with self.condition:
+            if after is not None and job.entry != after:
+                return
+            job.entry = next(self.entries)
+            due = job.base + (random.uniform(0, job.jitter) if job.jitter else 0)
+            heapq.heappush(self.queue, (due, job.entry, job))
+            if self.thread is None:
+                self.stopping = False
+                self.thread = Thread(target=self.work, name='Scheduler', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def stop(self):
+        """ End the worker thread; jobs still queued won't run. """
+        with self.condition:
+            thread = self.thread
+            self.stopping = True
+            self.queue.clear()
+            self.condition.notify()
+        if thread:
+            thread.join()
+
+    def unschedule(self, job):
+        """ Drop the job's next tick (its heap entry is skipped when due). """
+        with self.condition:
+            job.entry = None
+
+    def work(self):
+        """ The worker thread: sleep until the next tick is due, then run it. """
+        try:
+            while True:
+                with self.condition:
+                    while True:
+                        if self.stopping:
+                            return
+                        if self.queue:
+                            due, entry, job = self.queue[0]
+                            if job.entry != entry:
+                                heapq.heappop(self.queue)
+                                continue
+                            wait = due - time.monotonic()
+                            if wait <= 0:
+                                heapq.heappop(self.queue)
+                                break
+                            self.condition.wait(wait)
+                        else:
+                            self.condition.wait()
+                try:
+                    job.run(entry)
+                except Exception:
+                    # Its own bookkeeping failed: drop that job, keep the others
+                    traceback.print_exc()
+                    self.unschedule(job)
+        finally:
+            with self.condition:
+                if self.thread is current_thread():
+                    self.thread = None
+                    # Killed some other way: hand the queue to a new worker
+                    if self.queue and not self.stopping:
+                        self.thread = Thread(target=self.work, name='Scheduler', daemon=True)
+                        self.thread.start()
+
+
+def getScheduler():
+    """ Return the scheduler shared by all PollTimers, creating it if needed. """
+    global sharedScheduler
+    if sharedScheduler is None:
+        sharedScheduler = Scheduler()
+    return sharedScheduler
+
+
+sharedScheduler = None
 
 
 class Singleton:
@@ -6,55 +6,155 @@
 # 2020.05.26 - 2020.06.22
 #
 # Notes:
+#   - Changes are kept in memory and written together once they settle for
+#     <debounce> seconds, on flush(), or at exit. Writes go to a temp file
+#     that then replaces the config file, so a crash can't truncate it.
+#     One atexit hook flushes every Config still around, holding them only
+#     weakly, so a discarded Config can still be garbage collected.
+#   - Typed getters cache their parsed values. The cache (and the parser)
+#     only reload when the file's mtime or size changes, checked at most
+#     every <CFGSTATINTERVAL> seconds, so reads are a dict lookup.
 #
 
+import atexit
+import json
 import os
+import time
+import weakref
 from configparser import RawConfigParser
 from pathlib import Path
+from threading import RLock, Timer
 from tkinter import Tk
 
 from Util.globals import *
 
+# Every Config instance, for flushAll() at exit
+openConfigs = weakref.WeakSet()
+
+
+def flushAll():
+    """ Write unsaved changes of every Config (registered with atexit). """
+    for config in list(openConfigs):
+        config.flush()
+
+
+atexit.register(flushAll)
+
 
 class Config:
     """ Creates and manages a configuration file for an application.
         The name of the config file defaults to [appName].cfg. """
 
-    def __init__(self, appName):
+    def __init__(self, appName, debounce=CFGDEBOUNCE):
         super().__init__()
         self.config = RawConfigParser()
         self.filename = os.path.join(str(Path.home()), appName + '.cfg')
         self.recentFiles = []
         self.lastPath = None
+        # Write-behind state: unsaved changes, and file writes avoided so far
+        self.debounce = debounce
+        self.dirty = False
+        self.writesSaved = 0
+        # One timer at most, re-armed until the flushDue deadline passes
+        self.flushTimer = None
+        self.flushDue = 0.0
+        self.lock = RLock()
+        openConfigs.add(self)
+        # Parsed values by (section, item), then type; and the file they came from
+        self.cache = {}
+        self.fileStamp = None
+        self.lastCheck = 0.0
         # Read in the file and populate attributes
-        self.refresh()
+        self.refresh(force=True)
 
     # General data section ("general") ........................................
     def get(self, item, default=''):
         """ Return the associated configuration string value if it exists,
         otherwise return the passed default value. """
-        value = self.getSection(CFG_GENERAL, item)
-        return default if not value else value
+        return self.getValue(CFG_GENERAL, item, str, default)
+
+    def getBool(self, item, default=False):
+        """ Return the associated configuration boolean value (true/false,
+        yes/no, on/off, 1/0) if it exists, otherwise the passed default. """
+        return self.getValue(CFG_GENERAL, item, bool, default)
+
+    def getFloat(self, item, default=0.0):
+        """ Return the associated configuration float value if it exists,
+        otherwise return the passed default value. """
+        return self.getValue(CFG_GENERAL, item, float, default)
 
     def getInt(self, item, default=0):
         """ Return the associated configuration integer value if it exists,
         otherwise return the passed default value. """
-        value = self.getSection(CFG_GENERAL, item)
-        return default if not value else int(value)
+        return self.getValue(CFG_GENERAL, item, int, default)
+
+    def getList(self, item, default=None):
+        """ Return the associated configuration list (saved as JSON) if it
+        exists, otherwise the passed default. The list is shared with the
+        cache, so copy it before changing it. """
+        return self.getValue(CFG_GENERAL, item, list, default)
+
+    def close(self):
+        """ Write any unsaved changes, and leave this Config out of the exit
+            flush from now on. """
+        self.flush()
+        openConfigs.discard(self)
 
-    def refresh(self):
-        """ Re-read the configuration file to refresh memory. """
-        self.config.read(self.filename)
-        self.loadRecentFiles()
+    def flush(self):
+        """ Write any unsaved changes to the file now. """
+        with self.lock:
+            if self.flushTimer:
+                self.flushTimer.cancel()
+                self.flushTimer = None
+            if not self.dirty:
+                return
+            tempName = self.filename + '.tmp'
+            with open(tempName, 'w') as configfile:
+                self.config.write(configfile)
+                configfile.flush()
+                os.fsync(configfile.fileno())
+            os.replace(tempName, self.filename)
+            self.dirty = False
+            # Our own write; no need to read it back in
+            self.fileStamp = self.getFileStamp()
+
+    def refresh(self, force=False):
+        """ Re-read the configuration file to refresh memory, if it changed
+        since it was last read or written (or if forced). """
+        with self.lock:
+            # Save first, or the file would overwrite unsaved changes
+            self.flush()
+            self.lastCheck = time.monotonic()
+            stamp = self.getFileStamp()
+            if stamp == self.fileStamp and not force:
+                return
+            # A new parser, so items removed from the file go away too
+            self.config = RawConfigParser()
+            self.config.read(self.filename)
+            self.fileStamp = stamp
+            self.cache.clear()
+            self.loadRecentFiles()
 
     def set(self, item, data):
         """ Save a key:value pair in the config file, for a string value. """
         self.setSection(CFG_GENERAL, item, data)
 
+    def setBool(self, item, data):
+        """ Save a key:value pair in the config file, for a boolean value. """
+        self.set(item, 'true' if data else 'false')
+
+    def setFloat(self, item, data):
+        """ Save a key:value pair in the config file, for a float value. """
+        self.set(item, repr(float(data)))
+
     def setInt(self, item, data):
         """ Save a key:value pair in the config file, for a n integer value. """
         self.set(item, str(data))
 
+    def setList(self, item, data):
+        """ Save a key:value pair in the config file, for a list value. """
+        self.set(item, json.dumps(list(data)))
+
     # Geometry section ........................................................
     def restoreGeometry(self, app: Tk, default=APPDIMENSIONS):
         """ Update frame with saved geometry data. """
@@ -117,6 +217,20 @@ class Config:
         self.setSection(CFG_GENERAL, CFG_LASTPATH, os.path.dirname(path))
 
     # The worker bees, doing all the real work ................................
+    def checkFile(self):
+        """ Refresh if the file changed, looking at most every so often.
+            Unsaved changes win, so there's no point looking until written. """
+        if not self.dirty and time.monotonic() - self.lastCheck >= CFGSTATINTERVAL:
+            self.refresh()
+
+    def getFileStamp(self):
+        """ Return the file's (mtime, size), or None if there is no file. """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def getSection(self, section, item):
         """ Get an item from a section, if either exist; else None. """
         if self.config.has_section(section):
@@ -125,10 +239,67 @@ class Config:
         return None
 
     def setSection(self, section, item, data):
-        """ Set an item in a section, creating either if they don't exist. """
-        if not self.config.has_section(section):
-            self.config.add_section(section)
-        self.config.set(section, item, data)
-        # Write the updated file whenever anything changes
-        with open(self.filename, 'w') as configfile:
-            self.config.write(configfile)
+        """ Set an item in a section, creating either if they don't exist.
+            Setting None removes the item. """
+        with self.lock:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            if data is None:
+                # Otherwise the file would say 'None', which reads back as text
+                self.config.remove_option(section, item)
+            else:
+                self.config.set(section, item, data)
+            self.cache.pop((section, self.config.optionxform(item)), None)
+            # Write the file once changes stop for a moment
+            if self.dirty:
+                self.writesSaved += 1
+            self.dirty = True
+            self.flushDue = time.monotonic() + self.debounce
+            if self.flushTimer is None:
+                self.startFlushTimer(self.debounce)
+
+    def onFlushTimer(self):
+        """ Write the file if changes have settled, else wait out the rest. """
+        with self.lock:
+            self.flushTimer = None
+            remaining = self.flushDue - time.monotonic()
+            if self.dirty and remaining > 0:
+                self.startFlushTimer(remaining)
+            else:
+                self.flush()
+
+    def startFlushTimer(self, delay):
+        """ Arm the (single) timer that writes changes once they settle. """
+        self.flushTimer = Timer(delay, self.onFlushTimer)
+        self.flushTimer.daemon = True
+        self.flushTimer.start()
+
+    def getValue(self, section, item, kind=str, default=None):
+        """ Get an item from a section parsed as kind (str, int, float, bool
+            or list), or default if it is missing, empty or won't parse.
+            Parsed values are cached until the item or the file changes. """
+        self.checkFile()
+        key = (section, self.config.optionxform(item))
+        values = self.cache.get(key)
+        if values is None:
+            values = self.cache[key] = {}
+        if kind in values:
+            value = values[kind]
+        else:
+            value = values[kind] = parseValue(self.getSection(section, item), kind)
+        return default if value is None else value
+
+
+def parseValue(text, kind):
+    """ Convert a config string to kind; None if empty or it won't convert. """
+    if not text:
+        return None
+    try:
+        if kind is bool:
+            return RawConfigParser.BOOLEAN_STATES[text.lower()]
+        if kind is list:
+            value = json.loads(text)
+            return value if isinstance(value, list) else None
+        return kind(text)
+    except (KeyError, ValueError):
+        return None
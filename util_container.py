@@ -5,11 +5,329 @@
 # 2021.04.07 - 2021.04.08
 #
 # Notes:
+from array import array
+from random import random
+
+from Util.globals import FLUSHTHRESHOLD
+
+# ArrayLinkList "no link" slot and "no ID" values
+NULLSLOT = -1
+NULLID = -2 ** 63
 
 
 # Classes .....................................................................
+class ArrayLinkList:
+    """ An alternative DoubleLinkList backend for read-heavy lists, keeping
+        nodes in parallel arrays with next/previous links stored as integer
+        slots, and reusing deleted slots from a free list. Iterating touches
+        contiguous memory, each node costs a few machine words, and the whole
+        list pickles as a handful of arrays.
+        Offers the same cursor API; anything that returns a node returns an
+        ArrayLinkList.Node view of its slot. """
+    __slots__ = ('nodeIds', 'childIds', 'nrefs', 'prefs', 'labels', 'sublists',
+                 'head', 'tail', 'cursor', 'free', 'count')
+
+    class Node:
+        """ A lightweight stand-in for DoubleLinkList.Node, viewing one slot.
+            Views are made on demand; a view of a deleted node is invalid. """
+        __slots__ = ('owner', 'slot')
+
+        def __init__(self, owner, slot):
+            self.owner = owner
+            self.slot = slot
+
+        def __eq__(self, other):
+            return isinstance(other, ArrayLinkList.Node) and \
+                other.owner is self.owner and other.slot == self.slot
+
+        def __hash__(self):
+            return hash((id(self.owner), self.slot))
+
+        @property
+        def childId(self):
+            return ArrayLinkList.idOut(self.owner.childIds[self.slot])
+
+        @childId.setter
+        def childId(self, childId):
+            self.owner.childIds[self.slot] = ArrayLinkList.idIn(childId)
+
+        @property
+        def label(self):
+            return self.owner.labels[self.slot]
+
+        @label.setter
+        def label(self, label):
+            self.owner.labels[self.slot] = label
+
+        @property
+        def nodeId(self):
+            return ArrayLinkList.idOut(self.owner.nodeIds[self.slot])
+
+        @nodeId.setter
+        def nodeId(self, nodeId):
+            self.owner.nodeIds[self.slot] = ArrayLinkList.idIn(nodeId)
+
+        @property
+        def nref(self):
+            return self.owner.view(self.owner.nrefs[self.slot])
+
+        @property
+        def pref(self):
+            return self.owner.view(self.owner.prefs[self.slot])
+
+        @property
+        def sublist(self):
+            return self.owner.sublists[self.slot]
+
+        @sublist.setter
+        def sublist(self, sublist):
+            self.owner.sublists[self.slot] = sublist
+
+    def __init__(self):
+        self.nodeIds = array('q')
+        self.childIds = array('q')
+        self.nrefs = array('l')
+        self.prefs = array('l')
+        self.labels = []
+        self.sublists = []
+        self.head = NULLSLOT
+        self.tail = NULLSLOT
+        self.cursor = NULLSLOT
+        self.free = NULLSLOT
+        self.count = 0
+
+    def __iter__(self):
+        return (self.view(slot) for slot in self.slots())
+
+    def __len__(self):
+        return self.count
+
+    def __reversed__(self):
+        slot = self.tail
+        while slot != NULLSLOT:
+            yield self.view(slot)
+            slot = self.prefs[slot]
+
+    def addNode(self, appendIt=False, nodeId=None, childId=None, sublist=None, label=''):
+        """ Create a node and insert it before the cursor node, or append it at the end
+            of the list when requested. """
+        slot = self.allocate(nodeId, childId, sublist, label)
+        if self.head == NULLSLOT:
+            # Empty list, add as the first entity
+            self.head = self.tail = slot
+        elif appendIt:
+            self.prefs[slot] = self.tail
+            self.nrefs[self.tail] = slot
+            self.tail = slot
+        else:
+            before = self.prefs[self.cursor]
+            self.nrefs[slot] = self.cursor
+            self.prefs[self.cursor] = slot
+            if before == NULLSLOT:
+                self.head = slot
+            else:
+                self.prefs[slot] = before
+                self.nrefs[before] = slot
+        self.cursor = slot
+        return self.view(slot)
+
+    def allocate(self, nodeId, childId, sublist, label):
+        """ Fill a free slot (or a new one at the end) with this node data. """
+        self.count += 1
+        if self.free == NULLSLOT:
+            self.nodeIds.append(self.idIn(nodeId))
+            self.childIds.append(self.idIn(childId))
+            self.nrefs.append(NULLSLOT)
+            self.prefs.append(NULLSLOT)
+            self.labels.append(label)
+            self.sublists.append(sublist)
+            return len(self.labels) - 1
+        slot = self.free
+        self.free = self.nrefs[slot]
+        self.nodeIds[slot] = self.idIn(nodeId)
+        self.childIds[slot] = self.idIn(childId)
+        self.nrefs[slot] = NULLSLOT
+        self.labels[slot] = label
+        self.sublists[slot] = sublist
+        return slot
+
+    def atHead(self):
+        """ Check if this node is the first in the list. """
+        return self.cursor == self.head
+
+    def atTail(self):
+        """ Check if this node is the last in the list. """
+        return self.cursor == self.tail
+
+    def delete(self, atNode=None):
+        """ Delete this node (or the current node) from the list, returning
+            its slot to the free list. """
+        slot = atNode.slot if atNode else self.cursor
+        if slot == NULLSLOT:
+            # Empty list: NULLSLOT (-1) would index the last slot instead
+            return None
+        before, after = self.prefs[slot], self.nrefs[slot]
+        # Unlink, leaving the cursor where DoubleLinkList.delete() would
+        if before == NULLSLOT:
+            self.head = self.cursor = after
+            if after == NULLSLOT:
+                self.tail = NULLSLOT
+            else:
+                self.prefs[after] = NULLSLOT
+        elif after == NULLSLOT:
+            self.tail = self.cursor = before
+            self.nrefs[before] = NULLSLOT
+        else:
+            self.nrefs[before] = after
+            self.prefs[after] = before
+            self.cursor = after
+        # Clear the slot and push it on the free list
+        self.nodeIds[slot] = NULLID
+        self.childIds[slot] = NULLID
+        self.prefs[slot] = NULLSLOT
+        self.nrefs[slot] = self.free
+        self.labels[slot] = ''
+        self.sublists[slot] = None
+        self.free = slot
+        self.count -= 1
+        return self.view(self.cursor)
+
+    def find(self, node):
+        """ Set the cursor position to this node (matched by node ID, or by
+            identity if it has no ID yet). """
+        if node.nodeId is None:
+            found = node if isinstance(node, ArrayLinkList.Node) and node.owner is self \
+                else None
+        else:
+            found = self.getById(node.nodeId)
+        if found:
+            self.cursor = found.slot
+        return found
+
+    def findAt(self, index):
+        """ Given a zero-based index position, find the item at that position. """
+        if not 0 <= index < self.count:
+            return None
+        slot = self.head
+        for _ in range(index):
+            slot = self.nrefs[slot]
+        self.cursor = slot
+        return self.view(slot)
+
+    def first(self):
+        """ Set cursor to head and return value. """
+        if self.head != NULLSLOT:
+            self.cursor = self.head
+        return self.view(self.head)
+
+    def getById(self, nodeId):
+        """ Return the node with this node ID (or None), without moving the
+            cursor. A scan of the ID array, which runs at C speed. """
+        if nodeId is None or nodeId == NULLID:
+            # Free and ID-less slots hold NULLID, so there's nothing to find
+            return None
+        try:
+            return self.view(self.nodeIds.index(self.idIn(nodeId)))
+        except ValueError:
+            return None
+
+    def getChildId(self):
+        """ Return the data at the current node. """
+        if self.cursor != NULLSLOT:
+            return self.idOut(self.childIds[self.cursor])
+        return None
+
+    def getLabel(self):
+        if self.cursor != NULLSLOT:
+            return self.labels[self.cursor]
+        return ''
+
+    def getNodeId(self):
+        """ Return the data at the current node. """
+        if self.cursor != NULLSLOT:
+            return self.idOut(self.nodeIds[self.cursor])
+        return None
+
+    def getSublist(self):
+        """ Return child list for the current node, if it has one. """
+        if self.cursor != NULLSLOT:
+            return self.sublists[self.cursor]
+        return None
+
+    @staticmethod
+    def idIn(value):
+        """ Convert a node/child ID (or None) for storing in an ID array. """
+        return NULLID if value is None else value
+
+    @staticmethod
+    def idOut(value):
+        """ Convert a stored ID back (NULLID becomes None). """
+        return None if value == NULLID else value
+
+    def iterFrom(self, node, reverse=False):
+        """ Yield nodes from this one to the tail (or head, if reversed),
+            without moving the cursor. """
+        links = self.prefs if reverse else self.nrefs
+        slot = node.slot if node else NULLSLOT
+        while slot != NULLSLOT:
+            yield self.view(slot)
+            slot = links[slot]
+
+    def last(self):
+        """ Set cursor to tail and return value. """
+        if self.tail != NULLSLOT:
+            self.cursor = self.tail
+        return self.view(self.tail)
+
+    def next(self):
+        """ Set cursor to next node and return value. """
+        if self.cursor != NULLSLOT and self.nrefs[self.cursor] != NULLSLOT:
+            self.cursor = self.nrefs[self.cursor]
+            return self.view(self.cursor)
+        return None
+
+    def previous(self):
+        """ Set cursor to previous node and return value. """
+        if self.cursor != NULLSLOT and self.prefs[self.cursor] != NULLSLOT:
+            self.cursor = self.prefs[self.cursor]
+            return self.view(self.cursor)
+        return None
+
+    def setChildId(self, childId):
+        """ Update the child pointer ID for the current node. """
+        if self.cursor != NULLSLOT:
+            self.childIds[self.cursor] = self.idIn(childId)
+
+    def setLabel(self, label):
+        """ Update the label for the current node. """
+        if self.cursor != NULLSLOT:
+            self.labels[self.cursor] = label
+
+    def setNodeId(self, recId):
+        """ Update the node Id for the current node. """
+        if self.cursor != NULLSLOT:
+            self.nodeIds[self.cursor] = self.idIn(recId)
+
+    def setSublist(self, sublist):
+        """ Update the sublist for the current node. """
+        if self.cursor != NULLSLOT:
+            self.sublists[self.cursor] = sublist
+
+    def slots(self):
+        """ Yield the slot numbers of every node, in list order. """
+        slot = self.head
+        while slot != NULLSLOT:
+            yield slot
+            slot = self.nrefs[slot]
+
+    def view(self, slot):
+        """ Return a Node view of this slot (or None for NULLSLOT). """
+        return None if slot == NULLSLOT else ArrayLinkList.Node(self, slot)
+
+
 class DoubleLinkList:
     """ Implementing a double linked list, capable of nesting itself. """
+    __slots__ = ('head', 'tail', 'cursor', 'count', 'index', 'pending')
 
     class Node:
         """ The list's data holder:
@@ -18,7 +336,9 @@ class DoubleLinkList:
             pref = pointer to previous record (sibling)
             childId = any child data, like the foreign key to another table record
             sublist = pointer to another LL, for multidimensional lists
-            label = optional text for testing or for titles or whatever. """
+            label = optional text for testing or for titles or whatever.
+            Slotted (no per-node __dict__) to keep large lists compact. """
+        __slots__ = ('nodeId', 'nref', 'pref', 'childId', 'sublist', 'label')
 
         def __init__(self, nodeId=None, childId=None, sublist=None, label=''):
             self.nodeId = nodeId
@@ -32,11 +352,30 @@ class DoubleLinkList:
         self.head = None
         self.tail = None
         self.cursor = None
+        self.count = 0
+        # nodeId -> node lookup, and the nodes added without an ID, which may
+        # since have been given one directly (eg, by ListTable.save)
+        self.index = {}
+        self.pending = set()
+
+    def __iter__(self):
+        return self.iterFrom(self.head)
+
+    def __len__(self):
+        return self.count
+
+    def __reversed__(self):
+        return self.iterFrom(self.tail, reverse=True)
 
     def addNode(self, appendIt=False, nodeId=None, childId=None, sublist=None, label=''):
         """ Create a node and insert it before the cursor node, or append it at the end
             of the list when requested. """
         node = DoubleLinkList.Node(nodeId=nodeId, childId=childId, sublist=sublist, label=label)
+        if nodeId is None:
+            self.pending.add(node)
+        else:
+            self.index[nodeId] = node
+        self.count += 1
         if not self.head:
             # Empty list, add as the first entity
             self.head = self.tail = self.cursor = node
@@ -71,10 +410,16 @@ class DoubleLinkList:
         # Todo: Check for childId not None, and either recursively delete or abort.
         if not atNode:
             atNode = self.cursor
+        self.pending.discard(atNode)
+        if self.index.get(atNode.nodeId) is atNode:
+            del self.index[atNode.nodeId]
+        self.count -= 1
         if atNode == self.head:
             self.head = atNode.nref
             if self.head:
                 self.head.pref = None
+            else:
+                self.tail = None
             self.cursor = self.head
         else:
             if atNode == self.tail:
@@ -90,29 +435,23 @@ class DoubleLinkList:
         return self.cursor
 
     def find(self, node):
-        """ Set the cursor position to this node. """
-        saveCursor = self.cursor
-        if self.first() and self.cursor.nodeId == node.nodeId:
-            return self.cursor
-        while self.next():
-            if self.cursor.nodeId == node.nodeId:
-                return self.cursor
-        self.cursor = saveCursor
-        return None
+        """ Set the cursor position to this node (matched by node ID, or by
+            identity if it has no ID yet). """
+        if node.nodeId is None:
+            found = next((item for item in self if item is node), None)
+        else:
+            found = self.getById(node.nodeId)
+        if found:
+            self.cursor = found
+        return found
 
     def findAt(self, index):
         """ Given a zero-based index position, find the item at that position. """
-        saveCursor = self.cursor
-        i = 0
-        if self.first():
-            if index == i:
-                return self.cursor
-            else:
-                while self.next():
-                    i += 1
-                    if index == i:
-                        return self.cursor
-        self.cursor = saveCursor
+        if 0 <= index < self.count:
+            for i, node in enumerate(self):
+                if i == index:
+                    self.cursor = node
+                    return node
         return None
 
     def first(self):
@@ -122,6 +461,25 @@ class DoubleLinkList:
             return self.cursor
         return None
 
+    def getById(self, nodeId):
+        """ Return the node with this node ID (or None) in constant time,
+            without moving the cursor. """
+        node = self.index.get(nodeId)
+        if node and node.nodeId == nodeId:
+            return node
+        if node:
+            # Its ID was changed directly: file it under the new one
+            del self.index[nodeId]
+            self.indexNode(node)
+        if nodeId is not None and self.pending:
+            # Some IDs were assigned directly on new nodes (eg, by ListTable.save)
+            for late in [late for late in self.pending if late.nodeId is not None]:
+                self.indexNode(late)
+            node = self.index.get(nodeId)
+            if node and node.nodeId == nodeId:
+                return node
+        return None
+
     def getChildId(self):
         """ Return the data at the current node. """
         if self.cursor:
@@ -145,6 +503,22 @@ class DoubleLinkList:
             return self.cursor.sublist
         return None
 
+    def indexNode(self, node):
+        """ Add a node added without an ID to the node ID lookup. Call this
+            after setting its ID directly, rather than through setNodeId(). """
+        if node.nodeId is None:
+            self.pending.add(node)
+        else:
+            self.pending.discard(node)
+            self.index[node.nodeId] = node
+
+    def iterFrom(self, node, reverse=False):
+        """ Yield nodes from this one to the tail (or head, if reversed),
+            without moving the cursor, so loops can't disturb each other. """
+        while node:
+            yield node
+            node = node.pref if reverse else node.nref
+
     def last(self):
         """ Set cursor to head and return value. """
         if self.tail:
@@ -166,6 +540,16 @@ class DoubleLinkList:
             return self.cursor
         return None
 
+    def reindex(self):
+        """ Rebuild the node ID lookup from the list itself. """
+        self.index.clear()
+        self.pending.clear()
+        for node in self:
+            if node.nodeId is None:
+                self.pending.add(node)
+            else:
+                self.index.setdefault(node.nodeId, node)
+
     def setChildId(self, childId):
         """ Update the child pointer ID for the current node. """
         if self.cursor:
@@ -179,7 +563,10 @@ class DoubleLinkList:
     def setNodeId(self, recId):
         """ Update the node Id for the current node. """
         if self.cursor:
+            if self.index.get(self.cursor.nodeId) is self.cursor:
+                del self.index[self.cursor.nodeId]
             self.cursor.nodeId = recId
+            self.indexNode(self.cursor)
 
     def setSublist(self, sublist):
         """ Update the sublist for the current node. """
@@ -187,14 +574,58 @@ class DoubleLinkList:
             self.cursor.sublist = sublist
 
 
+class IndexedDoubleLinkList(DoubleLinkList):
+    """ A DoubleLinkList that also tracks every node's position in a RankTree,
+        so findAt(), indexOf() and len() take O(log n) instead of walking from
+        the head. Inserts and deletes at the cursor stay O(log n), and the
+        cursor API is unchanged. """
+    __slots__ = ('positions',)
+
+    def __init__(self):
+        super().__init__()
+        self.positions = RankTree()
+
+    def addNode(self, appendIt=False, nodeId=None, childId=None, sublist=None, label=''):
+        """ Create a node and insert it before the cursor node, or append it at the end
+            of the list when requested. """
+        if appendIt or not self.head:
+            index = self.count
+        else:
+            index = self.positions.indexOf(self.cursor)
+        node = super().addNode(appendIt=appendIt, nodeId=nodeId, childId=childId,
+                               sublist=sublist, label=label)
+        self.positions.insert(index, node)
+        return node
+
+    def delete(self, atNode=None):
+        """ Delete this node (or the current node) from the list. """
+        self.positions.remove(atNode if atNode else self.cursor)
+        return super().delete(atNode)
+
+    def findAt(self, index):
+        """ Given a zero-based index position, find the item at that position. """
+        node = self.positions.at(index)
+        if node:
+            self.cursor = node
+        return node
+
+    def indexOf(self, node):
+        """ Return the zero-based position of this node (or None). """
+        return self.positions.indexOf(node)
+
+
 class ListOfLists(DoubleLinkList):
     """ The parent list of other lists, creating a ragged 2-dimensional
         grid of lists (think solitaire, where cards can be moved in their list
         columns, and columns themselves can be manipulated likewise).
     """
 
-    def __init__(self):
+    __slots__ = ('sublistClass',)
+
+    def __init__(self, sublistClass=DoubleLinkList):
         super().__init__()
+        # Class used for new sublists (eg, IndexedDoubleLinkList for long columns)
+        self.sublistClass = sublistClass
 
     def addNode(self, appendIt=False, nodeId=None, childId=None, sublist=None, label=''):
         """ Adds a node at the current location of the current sublist, which means
@@ -214,7 +645,7 @@ class ListOfLists(DoubleLinkList):
             Adds it in the list of lists before the cursor node, or appends it at
             the end of the list when requested.
             Returns the node containing the sublist and makes it the new cursor. """
-        sublist = DoubleLinkList()
+        sublist = self.sublistClass()
         return super().addNode(appendIt=appendIt, nodeId=nodeId, childId=childId,
                                sublist=sublist, label=label)
 
@@ -225,33 +656,87 @@ class ListOfLists(DoubleLinkList):
             return self.cursor.childId
         return None
 
+    def iterCells(self):
+        """ Yield (list node, node) pairs for every node of every sublist, in
+            order, without moving either cursor. """
+        for listNode in self:
+            if listNode.sublist is not None:
+                for node in listNode.sublist:
+                    yield listNode, node
+
 
 class ListTable:
     """ Adds a table designed to hold lists and list of lists, while supporting a
         mutable editing and reording of this data with minimal updates needed in the
         database. Used as a base class for 'persistent' classes:
          - PersistentDoubleLinkList
-         - PersistentListOfLists. """
+         - PersistentListOfLists.
+        In write-behind mode, the persistent classes only mark changed nodes
+        dirty, and flush() saves them all in one transaction: call it when
+        convenient, let the dirty count reach <flushThreshold>, or poll it. """
 
-    def __init__(self, db, tableName):
+    def __init__(self, db, tableName, writeBehind=False, flushThreshold=FLUSHTHRESHOLD):
         super().__init__()
         self.db = db
         self.tableName = tableName
         self.headId = None
+        self.writeBehind = writeBehind
+        self.flushThreshold = flushThreshold
+        # Changed node -> the list it belongs to (an ordered set, for flush())
+        self.dirty = {}
+        self.headDirty = False
+        # Set while load() rebuilds the list, so nothing gets saved back
+        self.loading = False
         self.initTable()
 
+    def flush(self):
+        """ Save every dirty node, plus the head pointer if it moved, in one
+            transaction: new nodes get IDs from one bulk insert, then all dirty
+            records (now able to point at those IDs) go out in one bulk update.
+            If anything fails, it all stays dirty for the next try. """
+        if not self.dirty and not self.headDirty:
+            return
+        dirty = self.dirty
+        new = [node for node in dirty if not node.nodeId]
+        try:
+            with self.db.transaction():
+                records = [self.record(node) for node in new]
+                for node, newId in zip(new, self.db.insertMany(self.tableName, records)):
+                    node.nodeId = newId
+                    dirty[node].indexNode(node)
+                rows = []
+                for node in dirty:
+                    # A sublist's head may only just have received its ID
+                    if isinstance(dirty[node], ListOfLists) and node.sublist is not None:
+                        node.childId = node.sublist.head.nodeId if node.sublist.head else None
+                    rows.append((node.nodeId, self.record(node)))
+                self.db.updateMany(self.tableName, rows)
+                if self.headDirty:
+                    self.saveHeadId(self.head.nodeId if self.head else None)
+        except BaseException:
+            # Rolled back, so the new IDs were never saved: take them back
+            for node in new:
+                theList = dirty[node]
+                if node.nodeId is not None and theList.index.get(node.nodeId) is node:
+                    del theList.index[node.nodeId]
+                node.nodeId = None
+                theList.indexNode(node)
+            raise
+        self.dirty = {}
+        self.headDirty = False
+
     def initTable(self):
         """ Create the table, if it doesn't already exist in the current database.
             It also reserves the very first record to store the 'head' record ID,
             since this is mutable (the user can shift data around), thus we need
             a solid starting point, pointing to the head, wherever it may be in the
             table at the moment. """
-        sql = """ ( nodeId integer PRIMARY KEY,
+        sql = """ nodeId integer PRIMARY KEY,
                     nextId integer,
                     childId integer,
-                    label text);
+                    label text
             """
-        self.db.createTable(self.tableName + sql)
+        self.db.createTable(self.tableName, sql)
         # Reserve the first record as the head pointer, if it's not there
         found = self.db.selectById(self.tableName, 1)
         if not found:
@@ -260,32 +745,54 @@ class ListTable:
 
     def load(self, theList: DoubleLinkList):
         """ Load all connected nodes beginning with the Head ID from the first
-            record into the provided DoubleLinkList (1-dimensional). """
-        nextId = self.loadHeadId()
-        while nextId:
-            rec = self.db.selectById(self.tableName, nextId)
-            theList.addNode(appendIt=True, nodeId=rec['nodeId'], childId=rec['childId'],
-                            label=rec['label'])
-            nextId = rec['nextId']
+            record into the provided DoubleLinkList (1-dimensional). The whole
+            chain comes back from a single recursive query, in list order. """
+        self.loading = True
+        try:
+            for rec in self.loadChain(self.loadHeadId()):
+                theList.addNode(appendIt=True, nodeId=rec['nodeId'],
+                                childId=rec['childId'], label=rec['label'])
+        finally:
+            self.loading = False
+
+    def loadChain(self, headId):
+        """ Follow the nextId links from this node ID in one WITH RECURSIVE
+            query, returning the records in chain order. The row count limit
+            stops a corrupted (circular) chain from looping forever. """
+        if not headId:
+            return []
+        sql = """ WITH RECURSIVE chain(nodeId, nextId, childId, label) AS (
+                      SELECT nodeId, nextId, childId, label FROM {0} WHERE nodeId = ?
+                      UNION ALL
+                      SELECT t.nodeId, t.nextId, t.childId, t.label
+                        FROM {0} t JOIN chain ON t.nodeId = chain.nextId
+                      LIMIT (SELECT COUNT(*) FROM {0}))
+                  SELECT * FROM chain;
+              """.format(self.tableName)
+        return self.db.query(sql, (headId,))
 
     def loadListOfLists(self, theList: ListOfLists):
         """ Load all connected nodes beginning with the Head ID from the first
             record into the provided ListOfLists (2-dimensional), as sublists.
-            Then load each sublist. """
-        nextListId = self.loadHeadId()
-        while nextListId:
-            rec = self.db.selectById(self.tableName, nextListId)
-            childId = rec['childId']
-            theList.addList(appendIt=True, nodeId=rec['nodeId'], childId=childId,
-                            label=rec['label'])
-            nextListId = rec['nextId']
-            if childId:
-                nextNodeId = childId
-                while nextNodeId:
-                    rec = self.db.selectById(self.tableName, nextNodeId)
-                    theList.addNode(appendIt=True, nodeId=rec['nodeId'],
-                                    childId=rec['childId'], label=rec['label'])
-                    nextNodeId = rec['nextId']
+            Then load each sublist. Reads the table in one scan and rebuilds
+            the order of every chain in memory. """
+        records = self.loadRecords()
+        self.loading = True
+        try:
+            for rec in self.walk(records, self.loadHeadId()):
+                childId = rec['childId']
+                theList.addList(appendIt=True, nodeId=rec['nodeId'], childId=childId,
+                                label=rec['label'])
+                for subRec in self.walk(records, childId):
+                    theList.addNode(appendIt=True, nodeId=subRec['nodeId'],
+                                    childId=subRec['childId'], label=subRec['label'])
+        finally:
+            self.loading = False
+
+    def loadRecords(self):
+        """ Read every node record in one table scan, keyed by node ID. """
+        sql = 'SELECT nodeId, nextId, childId, label FROM ' + self.tableName
+        return {rec['nodeId']: rec for rec in self.db.query(sql)}
 
     def loadHeadId(self):
         """ Loads the first record of the table, which holds the record ID of
@@ -298,17 +805,33 @@ class ListTable:
         print('Error! No first sublist record found.')
         return None
 
+    def markDirty(self, owner, *nodes):
+        """ Queue nodes of this list (None is ignored) for the next flush(),
+            flushing now if enough have piled up. """
+        for node in nodes:
+            if node:
+                self.dirty[node] = owner
+        if len(self.dirty) >= self.flushThreshold:
+            self.flush()
+
+    @staticmethod
+    def record(node):
+        """ Return a node's fieldname:value dictionary for saving. """
+        nextId = node.nref.nodeId if node.nref else None
+        return dict(nextId=nextId, childId=node.childId, label=node.label)
+
     def save(self, node):
         """ Update node data to the database, filtering out passed siblings
             which are None. Inserts if there's no node ID, to acquire one from
             the new record ID, which also updates the previous nodes next ID.
             Otherwise it updates the old record. """
         if node:
-            nextId = node.nref.nodeId if node.nref else None
-            record = dict(nextId=nextId, childId=node.childId, label=node.label)
+            record = self.record(node)
             if not node.nodeId:
-                node.nodeId = self.db.insert(self.tableName, record)
-                self.save(node.pref)
+                # New record and the previous node's link commit together
+                with self.db.transaction():
+                    node.nodeId = self.db.insert(self.tableName, record)
+                    self.save(node.pref)
             else:
                 self.db.update(node.nodeId, self.tableName, record)
 
@@ -318,13 +841,45 @@ class ListTable:
         record = dict(nextId=None, childId=headId, label='head pointer')
         self.db.update(1, self.tableName, record)
 
+    def saveList(self, theList: ArrayLinkList):
+        """ Save a whole ArrayLinkList in one transaction, straight from its
+            arrays: new nodes get their record IDs from one bulk insert, then
+            every node's links and data go out in one bulk update. """
+        order = list(theList.slots())
+        with self.db.transaction():
+            new = [slot for slot in order if theList.nodeIds[slot] == NULLID]
+            records = [dict(childId=theList.idOut(theList.childIds[slot]),
+                            label=theList.labels[slot]) for slot in new]
+            for slot, newId in zip(new, self.db.insertMany(self.tableName, records)):
+                theList.nodeIds[slot] = newId
+            rows = []
+            for n, slot in enumerate(order):
+                nextId = theList.nodeIds[order[n + 1]] if n + 1 < len(order) else None
+                rows.append((theList.nodeIds[slot],
+                             dict(nextId=nextId, childId=theList.idOut(theList.childIds[slot]),
+                                  label=theList.labels[slot])))
+            self.db.updateMany(self.tableName, rows)
+            self.saveHeadId(theList.nodeIds[order[0]] if order else None)
+
     def saveNodeAndSiblings(self, node):
         """ Saves this node, plus its sibling nodes that also changed due to
             an add or move operation. The save() method automatically ignores
-            sibling nodes that are None. """
-        self.save(node)
-        self.save(node.pref)
-        self.save(node.nref)
+            sibling nodes that are None. All three are saved in one transaction. """
+        with self.db.transaction():
+            self.save(node)
+            self.save(node.pref)
+            self.save(node.nref)
+
+    @staticmethod
+    def walk(records, nextId):
+        """ Yield records from a loadRecords() dictionary, following the
+            nextId links from this node ID (stopping if a link loops). """
+        for _ in range(len(records)):
+            rec = records.get(nextId)
+            if not rec:
+                break
+            yield rec
+            nextId = rec['nextId']
 
 
 class PersistentDoubleLinkList(DoubleLinkList, ListTable):
@@ -333,9 +888,9 @@ class PersistentDoubleLinkList(DoubleLinkList, ListTable):
         data from the DoubleLinkList is an ID to lookup a more robust data object
         defined and handled in the overall application. """
 
-    def __init__(self, db, tableName):
+    def __init__(self, db, tableName, writeBehind=False, flushThreshold=FLUSHTHRESHOLD):
         DoubleLinkList.__init__(self)
-        ListTable.__init__(self, db, tableName)
+        ListTable.__init__(self, db, tableName, writeBehind, flushThreshold)
         # Load the table into memory
         self.load(self)
 
@@ -343,12 +898,20 @@ class PersistentDoubleLinkList(DoubleLinkList, ListTable):
         """ A wrapper for DoubleLinkList.addNode(), which calls the base class,
             then updates the database for this node and its immediate siblings.
             If the new node replaced the head node, also update the head pointer
-            record (record 1). """
+            record (record 1). In write-behind mode these are only marked dirty. """
         node = super().addNode(appendIt=appendIt, nodeId=nodeId, childId=childId,
                                sublist=sublist, label=label)
-        self.save(node)
-        if self.atHead():
-            self.saveHeadId(node.nodeId)
+        if self.loading:
+            return node
+        if self.writeBehind:
+            self.headDirty = self.headDirty or self.atHead()
+            self.markDirty(self, node, node.pref)
+            return node
+        with self.db.transaction():
+            self.save(node)
+            if self.atHead():
+                self.saveHeadId(node.nodeId)
+        self.indexNode(node)
         return node
 
 
@@ -356,9 +919,9 @@ class PersistentListOfLists(ListOfLists, ListTable):
     """ Adds persistence to the ListOfLists class, pretty much the same as
         PersistentDoubleLinkList does, but recursively. """
 
-    def __init__(self, db, tableName):
+    def __init__(self, db, tableName, writeBehind=False, flushThreshold=FLUSHTHRESHOLD):
         ListOfLists.__init__(self)
-        ListTable.__init__(self, db, tableName)
+        ListTable.__init__(self, db, tableName, writeBehind, flushThreshold)
         # Load the table into memory
         self.loadListOfLists(self)
 
@@ -369,11 +932,21 @@ class PersistentListOfLists(ListOfLists, ListTable):
             Use returned node.sublist or getSublist() to access the current sublist. """
         node = super().addNode(appendIt=appendIt, nodeId=nodeId, childId=childId,
                                label=label)
-        self.save(node)
-        if self.getSublist().atHead():
-            # Update childID (sublist head) if this node is first in the sublist
-            self.setChildId(node.nodeId)
-            self.save(self.cursor)
+        if self.loading:
+            return node
+        if self.writeBehind:
+            self.markDirty(self.getSublist(), node, node.pref)
+            # A new sublist head changes the list node's childId too
+            if self.getSublist().atHead():
+                self.markDirty(self, self.cursor)
+            return node
+        with self.db.transaction():
+            self.save(node)
+            if self.getSublist().atHead():
+                # Update childID (sublist head) if this node is first in the sublist
+                self.setChildId(node.nodeId)
+                self.save(self.cursor)
+        self.getSublist().indexNode(node)
         return node
 
     def addList(self, appendIt=False, nodeId=None, childId=None, label=''):
@@ -383,7 +956,125 @@ class PersistentListOfLists(ListOfLists, ListTable):
             Returns the node containing the sublist and makes it the new cursor. """
         node = super().addList(appendIt=appendIt, nodeId=nodeId, childId=childId,
                                label=label)
-        self.save(node)
-        if self.atHead():
-            self.saveHeadId(node.nodeId)
+        if self.loading:
+            return node
+        if self.writeBehind:
+            self.headDirty = self.headDirty or self.atHead()
+            self.markDirty(self, node, node.pref)
+            return node
+        with self.db.transaction():
+            self.save(node)
+            if self.atHead():
+                self.saveHeadId(node.nodeId)
+        self.indexNode(node)
         return node
+
+
+class RankTree:
+    """ Keeps items in order by position in an implicit treap (a randomly
+        balanced binary tree, where each branch knows its subtree size), for
+        O(log n) lookups by index, index of an item, inserts and removals. """
+    __slots__ = ('root', 'branches')
+
+    class Branch:
+        """ Tree node: holds one item, its random heap priority, and the size
+            of the subtree below (and including) it. """
+        __slots__ = ('item', 'priority', 'size', 'left', 'right', 'parent')
+
+        def __init__(self, item):
+            self.item = item
+            self.priority = random()
+            self.size = 1
+            self.left = None
+            self.right = None
+            self.parent = None
+
+    def __init__(self):
+        self.root = None
+        self.branches = {}
+
+    def __len__(self):
+        return self.root.size if self.root else 0
+
+    def at(self, index):
+        """ Return the item at this zero-based position (or None). """
+        if not 0 <= index < len(self):
+            return None
+        branch = self.root
+        while True:
+            leftSize = branch.left.size if branch.left else 0
+            if index < leftSize:
+                branch = branch.left
+            elif index == leftSize:
+                return branch.item
+            else:
+                index -= leftSize + 1
+                branch = branch.right
+
+    def indexOf(self, item):
+        """ Return the zero-based position of this item (or None). """
+        branch = self.branches.get(item)
+        if not branch:
+            return None
+        index = branch.left.size if branch.left else 0
+        while branch.parent:
+            parent = branch.parent
+            if branch is parent.right:
+                index += (parent.left.size if parent.left else 0) + 1
+            branch = parent
+        return index
+
+    def insert(self, index, item):
+        """ Insert an item at this zero-based position. """
+        branch = RankTree.Branch(item)
+        self.branches[item] = branch
+        left, right = self._split(self.root, index)
+        self._setRoot(self._merge(self._merge(left, branch), right))
+
+    def remove(self, item):
+        """ Remove this item, if it is in the tree. """
+        index = self.indexOf(item)
+        if index is not None:
+            del self.branches[item]
+            left, right = self._split(self.root, index)
+            _, right = self._split(right, 1)
+            self._setRoot(self._merge(left, right))
+
+    def _merge(self, left, right):
+        """ Join two trees, all of left's items before right's. """
+        if not left or not right:
+            return left or right
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            self._update(left)
+            return left
+        right.left = self._merge(left, right.left)
+        self._update(right)
+        return right
+
+    def _setRoot(self, branch):
+        self.root = branch
+        if branch:
+            branch.parent = None
+
+    def _split(self, branch, index):
+        """ Split a tree into the first <index> items and the rest. """
+        if not branch:
+            return None, None
+        leftSize = branch.left.size if branch.left else 0
+        if index <= leftSize:
+            left, branch.left = self._split(branch.left, index)
+            self._update(branch)
+            return left, branch
+        branch.right, right = self._split(branch.right, index - leftSize - 1)
+        self._update(branch)
+        return branch, right
+
+    @staticmethod
+    def _update(branch):
+        """ Recount subtree size and reconnect children to their parent. """
+        branch.size = 1
+        for child in (branch.left, branch.right):
+            if child:
+                child.parent = branch
+                branch.size += child.size
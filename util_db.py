@@ -5,33 +5,184 @@
 # 2020.05.26 - 2021.04.08
 #
 # Notes:
+#   - Connections come from a per-thread pool and stay open until the Database
+#     is closed, so a load or save pass reuses one warm connection (and its
+#     statement cache) instead of reconnecting for every call.
+#   - Connections run in autocommit mode: a single write commits itself, and
+#     transaction() groups several writes into one commit.
+#   - A pragma profile (PRAGMAPROFILES) tunes every connection as it opens:
+#     WAL journaling lets readers carry on while a writer commits, and
+#     synchronous=NORMAL in WAL mode only syncs at checkpoints, not per commit.
+#     Without one, connections keep SQLite's defaults.
+#   - AsyncDatabase wraps a Database for asyncio code: reads and writes run
+#     on threads of their own, and are awaited.
 #
 
+import asyncio
 import sqlite3
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from queue import Empty, Full, Queue
+from threading import Condition, Thread, current_thread, local
+from time import monotonic
 
-from Util.globals import DBDATEFORMAT
+from Util.globals import DBBULKLOAD, DBDATEFORMAT, DBDURABLE, DBINTERACTIVE, DBPOOLSIZE, \
+    DBPOOLTIMEOUT, DBREADERS, DBSTATEMENTCACHE, DBWRITEBATCH, DBWRITEQUEUE
+
+# Pragmas run on each new connection, in order (busy_timeout first, so the
+# journal_mode change can wait out another connection's lock)
+PRAGMAPROFILES = {
+    # UI saves: quick commits, readers never blocked, safe against app crashes
+    DBINTERACTIVE: (('busy_timeout', 5000), ('journal_mode', 'WAL'),
+                    ('synchronous', 'NORMAL'), ('cache_size', -16000),
+                    ('mmap_size', 64 * 2 ** 20), ('temp_store', 'MEMORY')),
+    # Imports: no syncs at all (an OS crash can lose the import), big caches
+    DBBULKLOAD: (('busy_timeout', 30000), ('journal_mode', 'WAL'),
+                 ('synchronous', 'OFF'), ('cache_size', -64000),
+                 ('mmap_size', 256 * 2 ** 20), ('temp_store', 'MEMORY')),
+    # Every commit synced, even in WAL mode
+    DBDURABLE: (('busy_timeout', 10000), ('journal_mode', 'WAL'),
+                ('synchronous', 'FULL'), ('cache_size', -8000),
+                ('mmap_size', 0), ('temp_store', 'DEFAULT')),
+}
+
+
+class ConnectionPool:
+    """ Hands out one SQLite connection per thread, reusing idle connections
+        and opening new ones only while under the size limit. Connections held
+        by threads that died without releasing them are counted as leaks and
+        reclaimed. """
+
+    def __init__(self, path, size=DBPOOLSIZE, timeout=DBPOOLTIMEOUT, pragmas=()):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.idle = []
+        self.owners = {}
+        self.leaks = 0
+        self.closed = False
+        self.lock = Condition()
+
+    def acquire(self):
+        """ Return the calling thread's connection, opening or recycling one if
+            needed. Waits up to <timeout> seconds when the pool is exhausted. """
+        thread = current_thread()
+        with self.lock:
+            conn = self.owners.get(thread)
+            if conn:
+                return conn
+            if self.closed:
+                raise sqlite3.ProgrammingError('Connection pool is closed.')
+            deadline = monotonic() + self.timeout
+            while True:
+                self._reclaim()
+                if self.idle:
+                    conn = self.idle.pop()
+                elif len(self.owners) < self.size:
+                    conn = self._open()
+                else:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise sqlite3.OperationalError(
+                            'Connection pool exhausted ({} connections).'.format(self.size))
+                    self.lock.wait(remaining)
+                    continue
+                self.owners[thread] = conn
+                return conn
+
+    def close(self):
+        """ Close every connection, idle or in use, and refuse new requests. """
+        with self.lock:
+            self.closed = True
+            for conn in self.idle + list(self.owners.values()):
+                conn.close()
+            self.idle.clear()
+            self.owners.clear()
+            self.lock.notify_all()
+
+    def count(self):
+        """ Returns the number of open connections (idle or in use). """
+        with self.lock:
+            return len(self.idle) + len(self.owners)
+
+    def release(self):
+        """ Return the calling thread's connection to the pool, rolling back
+            anything left uncommitted. Worker threads call this when done. """
+        with self.lock:
+            conn = self.owners.pop(current_thread(), None)
+            if conn:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                self.idle.append(conn)
+                self.lock.notify()
+
+    def _open(self):
+        """ Open a new connection. Threads only ever use their own connection,
+            but close() and leak recovery may touch it from another thread. """
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=DBSTATEMENTCACHE,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute('PRAGMA {}={}'.format(name, value))
+        return conn
+
+    def _reclaim(self):
+        """ Recover connections from threads that exited without releasing. """
+        for thread in [t for t in self.owners if not t.is_alive()]:
+            conn = self.owners.pop(thread)
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self.idle.append(conn)
+            self.leaks += 1
+            warnings.warn('Thread {} exited without releasing its connection to {}.'
+                          .format(thread.name, self.path), ResourceWarning)
 
 
 class Database:
-    """ Simplified API between the app and an SQLite3 database. """
+    """ Simplified API between the app and an SQLite3 database.
+        Use as a context manager, or call close() when done. The <profile>
+        is a PRAGMAPROFILES name, or a (pragma, value) sequence of your own. """
 
-    def __init__(self, name):
+    def __init__(self, name, poolSize=DBPOOLSIZE, profile=None):
         self.path = name
+        if isinstance(profile, str):
+            if profile not in PRAGMAPROFILES:
+                raise ValueError('Unknown pragma profile: ' + profile)
+            profile = PRAGMAPROFILES[profile]
+        self.pool = ConnectionPool(name, poolSize, pragmas=profile or ())
+        self.local = local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+    def __del__(self):
+        pool = getattr(self, 'pool', None)
+        if pool and not pool.closed:
+            pool.close()
 
     def backup(self, toPath):
         """ Copy this database to another location. """
-        source = sqlite3.connect(self.path)
+        source, curs = self.connect()
+        curs.close()
         dest = sqlite3.connect(toPath)
         with dest:
             source.backup(dest)
         dest.close()
-        source.close()
+
+    def close(self):
+        """ Close all pooled connections. """
+        self.pool.close()
 
     def connect(self):
-        """ Create a DB connection. Return connection and cursor. """
-        conn = sqlite3.connect(self.path)
-        conn.row_factory = sqlite3.Row
+        """ Get this thread's pooled DB connection. Return connection and cursor. """
+        conn = self.pool.acquire()
         return conn, conn.cursor()
 
     def createIndex(self, indexName, tableName, sql):
@@ -67,14 +218,15 @@ class Database:
         sql = 'DELETE FROM ' + table + ' WHERE id=?'
         conn, curs = self.connect()
         curs.execute(sql, (idNum,))
-        conn.commit()
         curs.close()
 
     def getCount(self, table):
         """ Returns the number of records in this table. """
         conn, curs = self.connect()
         curs.execute('SELECT COUNT(*) FROM ' + table)
-        return curs.fetchone()[0]
+        count = curs.fetchone()[0]
+        curs.close()
+        return count
 
     def getIds(self, table):
         """ Returns a list of ids from all records. """
@@ -89,44 +241,319 @@ class Database:
 
     def insert(self, table, data):
         """ Insert a record from a fielddname:value dictionary. """
-        sql = 'INSERT INTO ' + table + ' ('
-        sql += ", ".join(map(str, data.keys())) + ") "
-        sql += "VALUES (" + '?, ' * (len(data) - 1) + '?);'
+        sql = self.insertSql(table, data.keys())
         # Execute the SQL statement
         conn, curs = self.connect()
         vals = list(data.values())
         curs.execute(sql, vals)
-        conn.commit()
         # Return the new recod's ID
         newId = curs.lastrowid
         curs.close()
         return newId
 
-    def query(self, sql):
-        """ A general query (I intend to use primarily for testing only). """
+    def insertMany(self, table, rows):
+        """ Insert many fieldname:value dictionaries with one commit. Rows are
+            grouped by column set for executemany(). Returns the new record IDs
+            in the same order as the rows. """
+        rows = list(rows)
+        newIds = [None] * len(rows)
         conn, curs = self.connect()
-        curs.execute(sql)
-# Todo: finish this?
+        with self.transaction():
+            for keys, positions in self._groupByColumns(rows).items():
+                sql = self.insertSql(table, keys)
+                if self._setsRowId(table, keys):
+                    # Explicit IDs: insert one at a time to learn each new ID
+                    for n in positions:
+                        curs.execute(sql, list(rows[n].values()))
+                        newIds[n] = curs.lastrowid
+                    continue
+                curs.executemany(sql, [list(rows[n].values()) for n in positions])
+                # One writer inside one transaction, so new IDs are consecutive
+                curs.execute('SELECT MAX(ROWID) FROM ' + table)
+                firstId = curs.fetchone()[0] - len(positions) + 1
+                for offset, n in enumerate(positions):
+                    newIds[n] = firstId + offset
+        curs.close()
+        return newIds
+
+    @staticmethod
+    def insertSql(table, keys):
+        """ Build a parameterized INSERT statement for these field names. """
+        keys = list(keys)
+        sql = 'INSERT INTO ' + table + ' ('
+        sql += ", ".join(map(str, keys)) + ") "
+        sql += "VALUES (" + '?, ' * (len(keys) - 1) + '?);'
+        return sql
+
+    def query(self, sql, params=()):
+        """ A general query, returning all resulting rows as a list of "Row"s. """
+        conn, curs = self.connect()
+        curs.execute(sql, params)
+        rows = curs.fetchall()
+        curs.close()
+        return rows
 
     def selectById(self, table, idNum):
         """ Load a card, returning a dictionary "Row" of fields (or None). """
         conn, curs = self.connect()
-        sql = 'SELECT * FROM {} WHERE ROWID = {}'.format(table, str(idNum))
-        curs.execute(sql)
+        # Bind the ID so the statement cache can reuse the compiled query
+        sql = 'SELECT * FROM {} WHERE ROWID = ?'.format(table)
+        curs.execute(sql, (idNum,))
         result = curs.fetchone()
         curs.close()
         return result
 
+    @contextmanager
+    def transaction(self):
+        """ Group all writes in the block into one commit, rolling back if an
+            exception escapes. Nested blocks become savepoints, so an inner
+            failure only undoes the inner block.
+            Usage:
+                with db.transaction():
+                    db.insert(...)
+                    db.update(...) """
+        conn, curs = self.connect()
+        depth = getattr(self.local, 'depth', 0)
+        savepoint = 'level' + str(depth)
+        curs.execute('SAVEPOINT ' + savepoint if depth else 'BEGIN')
+        self.local.depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            if depth:
+                curs.execute('ROLLBACK TO ' + savepoint)
+                curs.execute('RELEASE ' + savepoint)
+            else:
+                curs.execute('ROLLBACK')
+            raise
+        else:
+            curs.execute('RELEASE ' + savepoint if depth else 'COMMIT')
+        finally:
+            self.local.depth = depth
+            curs.close()
+
     def update(self, idNum, table, data):
         """ Update an existing record from a fieldname:value dictionary. """
-        sql = 'UPDATE ' + table + ' SET '
-        for key in data.keys():
-            sql += key + ' = ?, '
-        sql = sql.rstrip(', ') + ' WHERE ROWID = ?'
+        sql = self.updateSql(table, data.keys())
         vals = list(data.values())
         vals.append(str(idNum))
         # Execute the SQL statement
         conn, curs = self.connect()
         curs.execute(sql, vals)
-        conn.commit()
         curs.close()
+
+    def updateMany(self, table, rows):
+        """ Update many records with one commit, from (ID, fieldname:value
+            dictionary) pairs. Rows are grouped by column set for executemany(). """
+        rows = list(rows)
+        conn, curs = self.connect()
+        with self.transaction():
+            for keys, positions in self._groupByColumns(data for _, data in rows).items():
+                vals = []
+                for n in positions:
+                    idNum, data = rows[n]
+                    vals.append(list(data.values()) + [idNum])
+                curs.executemany(self.updateSql(table, keys), vals)
+        curs.close()
+
+    @staticmethod
+    def updateSql(table, keys):
+        """ Build a parameterized UPDATE (by ROWID) statement for these field names. """
+        sql = 'UPDATE ' + table + ' SET '
+        for key in keys:
+            sql += key + ' = ?, '
+        return sql.rstrip(', ') + ' WHERE ROWID = ?'
+
+    # Helpers .................................................................
+    @staticmethod
+    def _groupByColumns(rows):
+        """ Map each distinct column set (in first-seen order) to the positions
+            of the rows using it. """
+        groups = {}
+        for n, data in enumerate(rows):
+            groups.setdefault(tuple(data.keys()), []).append(n)
+        return groups
+
+    def _setsRowId(self, table, keys):
+        """ Check if these columns include the ROWID or its INTEGER PRIMARY KEY alias. """
+        aliases = {'rowid', 'oid', '_rowid_'}
+        conn, curs = self.connect()
+        curs.execute('PRAGMA table_info(' + table + ')')
+        pkCols = [row['name'] for row in curs.fetchall() if row['pk']]
+        curs.close()
+        if len(pkCols) == 1:
+            aliases.add(pkCols[0].lower())
+        return any(key.lower() in aliases for key in keys)
+
+
+class AsyncDatabase:
+    """ asyncio front end for a Database, keeping SQLite off the event loop.
+        Writes run in order on one writer thread, fed by a bounded queue;
+        whatever has queued up meanwhile is committed together (each write in
+        its own savepoint, so one failure doesn't undo the rest). Reads run
+        concurrently on a small pool of reader threads; that takes WAL mode,
+        so the default profile is DBINTERACTIVE (with a rollback journal,
+        reads wait out each commit). While the queue is full, awaiting a
+        write waits its turn; stats() reports how often.
+        Usage:
+            async with AsyncDatabase('app.db') as db:
+                newId = await db.insert('cards', dict(title='New'))
+                card = await db.selectById('cards', newId) """
+
+    def __init__(self, name, readers=DBREADERS, queueSize=DBWRITEQUEUE,
+                 batchSize=DBWRITEBATCH, profile=DBINTERACTIVE):
+        # A connection per reader, the writer, and the caller (createTable...)
+        self.db = Database(name, poolSize=readers + 2, profile=profile)
+        self.batchSize = batchSize
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix='DbReader')
+        self.queue = Queue(queueSize)
+        self.writer = Thread(target=self._writeLoop, name='DbWriter', daemon=True)
+        self.writer.start()
+        # Backpressure metrics
+        self.writes = 0
+        self.commits = 0
+        self.waits = 0
+        self.waitTime = 0.0
+        self.maxDepth = 0
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc):
+        await self.close()
+
+    async def backup(self, toPath):
+        """ Copy this database to another location. """
+        return await self.read(self.db.backup, toPath)
+
+    async def close(self):
+        """ Finish the queued writes and reads, then close every connection.
+            Writes after this raise ProgrammingError. """
+        self.closed = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.queue.put, None)
+        await loop.run_in_executor(None, self.writer.join)
+        await loop.run_in_executor(None, self.readers.shutdown)
+        self.db.close()
+
+    async def delete(self, table, idNum):
+        """ Delete a record by its ID. """
+        return await self.write(self.db.delete, table, idNum)
+
+    async def getCount(self, table):
+        """ Returns the number of records in this table. """
+        return await self.read(self.db.getCount, table)
+
+    async def getIds(self, table):
+        """ Returns a list of ids from all records. """
+        return await self.read(self.db.getIds, table)
+
+    async def insert(self, table, data):
+        """ Insert a record from a fieldname:value dictionary; returns its ID. """
+        return await self.write(self.db.insert, table, data)
+
+    async def insertMany(self, table, rows):
+        """ Insert many fieldname:value dictionaries; returns their new IDs. """
+        return await self.write(self.db.insertMany, table, list(rows))
+
+    async def query(self, sql, params=()):
+        """ A general (read-only) query, returning all resulting rows. """
+        return await self.read(self.db.query, sql, params)
+
+    async def read(self, func, *args):
+        """ Run a Database read on a reader thread. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, func, *args)
+
+    async def selectById(self, table, idNum):
+        """ Load a record, returning a dictionary "Row" of fields (or None). """
+        return await self.read(self.db.selectById, table, idNum)
+
+    def stats(self):
+        """ Returns the backpressure metrics: writes queued now and at most,
+            writes and commits done, and how many writes waited for room in
+            the queue and for how long in all (seconds). """
+        return dict(depth=self.queue.qsize(), maxDepth=self.maxDepth,
+                    writes=self.writes, commits=self.commits,
+                    waits=self.waits, waitTime=self.waitTime)
+
+    async def update(self, idNum, table, data):
+        """ Update an existing record from a fieldname:value dictionary. """
+        return await self.write(self.db.update, idNum, table, data)
+
+    async def updateMany(self, table, rows):
+        """ Update many records from (ID, fieldname:value dictionary) pairs. """
+        return await self.write(self.db.updateMany, table, list(rows))
+
+    async def write(self, func, *args):
+        """ Queue a Database write for the writer thread and await its result. """
+        if self.closed:
+            # It would queue behind the writer's stop signal, and never run
+            raise sqlite3.ProgrammingError('AsyncDatabase is closed.')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item = (func, args, loop, future)
+        try:
+            self.queue.put_nowait(item)
+        except Full:
+            # Wait for room without blocking the event loop
+            self.waits += 1
+            start = monotonic()
+            await loop.run_in_executor(None, self.queue.put, item)
+            self.waitTime += monotonic() - start
+        self.maxDepth = max(self.maxDepth, self.queue.qsize())
+        return await future
+
+    # Helpers .................................................................
+    @staticmethod
+    def _settle(loop, future, result=None, error=None):
+        """ Hand a write's outcome back to its event loop (if still there). """
+        def settle():
+            if future.cancelled():
+                return
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        try:
+            loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass  # The loop closed without waiting
+
+    def _writeLoop(self):
+        """ The writer thread: commit queued writes in batches until closed. """
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.batchSize:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            done = batch[-1] is None
+            if done:
+                batch.pop()
+            if batch:
+                self._writeBatch(batch)
+            if done:
+                self.db.pool.release()
+                return
+
+    def _writeBatch(self, batch):
+        """ Run a batch of writes in one transaction, then report the outcomes. """
+        outcomes = []
+        try:
+            with self.db.transaction():
+                for func, args, loop, future in batch:
+                    try:
+                        with self.db.transaction():
+                            outcomes.append((func(*args), None))
+                    except Exception as error:
+                        outcomes.append((None, error))
+        except Exception as error:
+            # The commit itself failed, so none of them happened
+            outcomes = [(None, error)] * len(batch)
+        self.writes += len(batch)
+        self.commits += 1
+        for (func, args, loop, future), (result, error) in zip(batch, outcomes):
+            self._settle(loop, future, result, error)
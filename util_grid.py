@@ -0,0 +1,424 @@
+# Util.util_grid.py
+# Grid bookkeeping for util_tkgrid.py that doesn't need Tkinter (or a display).
+# .............................................................................
+# Miki R. Marshall (Mikibits.com)
+#
+# 2021.04.15
+#
+# Notes:
+#   - Positions are (row, col) tuples, with no upper limit on either.
+#   - Each occupied row keeps a sorted list of its occupied columns (and vice
+#     versa), so point lookups are O(1), and rectangle and first-free-cell
+#     queries are O(log n + k) for k cells found or skipped.
+#   - Moves are planned for a whole group of cells at once, then applied by
+#     lifting every moving item out before putting any down.
+#   - GridModel is DesktopFrame's layout logic without the widgets, so it can
+#     be tested and benchmarked headless (see Tests/bench_util_grid.py).
+#
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from inspect import Parameter, signature
+
+from Util.globals import MOVEPUSH, MOVEREJECT, MOVESWAP, GRIDROWS, GRIDCOLS, WIDGETHEIGHT, WIDGETWIDTH, \
+    DESKTOPPADX, DESKTOPPADY
+
+
+class GridIndex:
+    """ Spatial index of items (widgets, cards) by grid position, holding
+        at most one item per cell. """
+
+    def __init__(self):
+        self.cells = {}
+        # Occupied row -> sorted occupied cols, and col -> sorted rows
+        self.rows = {}
+        self.cols = {}
+        # Sorted occupied row numbers and column numbers
+        self.rowKeys = []
+        self.colKeys = []
+
+    def __contains__(self, position):
+        return position in self.cells
+
+    def __iter__(self):
+        """ Iterate over the occupied positions, in no particular order. """
+        return iter(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def applyMoves(self, moves):
+        """ Carry out a plan from planMove(). Returns the items moved, in
+            the same order as the moves. """
+        items = [self.pop(*source) for source, _ in moves]
+        for item, (_, (row, col)) in zip(items, moves):
+            self.put(row, col, item)
+        return items
+
+    def clear(self):
+        """ Forget every item. """
+        self.cells.clear()
+        self.rows.clear()
+        self.cols.clear()
+        self.rowKeys.clear()
+        self.colKeys.clear()
+
+    def column(self, col, top=0, bottom=None):
+        """ Yield items in this column from top to bottom row (inclusive). """
+        for row in self._between(self.cols.get(col, ()), top, bottom):
+            yield self.cells[row, col]
+
+    def firstFree(self, row=0, col=0, width=None):
+        """ Return the first empty (row, col) at or after this position in
+            row-major order, wrapping rows at <width> columns (if given). """
+        while True:
+            if width is not None and col >= width:
+                row, col = row + 1, 0
+            occupied = self.rows.get(row)
+            if not occupied:
+                return row, col
+            # Walk the run of occupied cells starting at col, if any
+            n = bisect_left(occupied, col)
+            while n < len(occupied) and occupied[n] == col:
+                n += 1
+                col += 1
+            if width is None or col < width:
+                return row, col
+
+    def get(self, row, col):
+        """ Return the item at this position, or None. """
+        return self.cells.get((row, col))
+
+    def items(self):
+        """ Return (position, item) pairs, like a dictionary. """
+        return self.cells.items()
+
+    def planMove(self, positions, rows=0, cols=0, policy=MOVEREJECT, height=None,
+                 width=None):
+        """ Plan to shift the items at these positions by rows, cols together.
+            Items in the way are handled by policy: MOVEREJECT gives up,
+            MOVESWAP drops each one into the cell vacated behind it, and
+            MOVEPUSH shoves them (and whatever they hit) the same way.
+            Returns [(fromPosition, toPosition), ...], or None if the move is
+            blocked or would leave the height x width grid (when given). """
+        moving = set(positions)
+        moves = [(source, (source[0] + rows, source[1] + cols)) for source in moving]
+        targets = {target for _, target in moves}
+        blockers = [target for target in targets
+                    if target in self.cells and target not in moving]
+        if blockers and policy == MOVESWAP:
+            for blocker in blockers:
+                # Step back along the moving block to the cell it leaves empty
+                row, col = blocker[0] - rows, blocker[1] - cols
+                while (row, col) in targets:
+                    row, col = row - rows, col - cols
+                moves.append((blocker, (row, col)))
+        elif blockers and policy == MOVEPUSH:
+            pushed = set()
+            while blockers:
+                pushed.update(blockers)
+                moves.extend((cell, (cell[0] + rows, cell[1] + cols)) for cell in blockers)
+                blockers = [(row + rows, col + cols) for row, col in blockers]
+                blockers = [cell for cell in blockers if cell in self.cells
+                            and cell not in moving and cell not in pushed]
+        elif blockers:
+            return None
+        for _, (row, col) in moves:
+            if row < 0 or col < 0 or (height is not None and row >= height) or \
+                    (width is not None and col >= width):
+                return None
+        return moves
+
+    def pop(self, row, col):
+        """ Remove and return the item at this position (KeyError if empty). """
+        item = self.cells.pop((row, col))
+        self._unlink(self.rows, self.rowKeys, row, col)
+        self._unlink(self.cols, self.colKeys, col, row)
+        return item
+
+    def put(self, row, col, item):
+        """ Place an item at this position, replacing any item already there. """
+        if (row, col) not in self.cells:
+            self._link(self.rows, self.rowKeys, row, col)
+            self._link(self.cols, self.colKeys, col, row)
+        self.cells[row, col] = item
+
+    def rect(self, top=0, left=0, bottom=None, right=None):
+        """ Yield ((row, col), item) for every item in this rectangle (edges
+            inclusive; a missing bottom or right is unbounded), row by row. """
+        for row in self._between(self.rowKeys, top, bottom):
+            for col in self._between(self.rows[row], left, right):
+                yield (row, col), self.cells[row, col]
+
+    def row(self, row, left=0, right=None):
+        """ Yield items in this row from left to right column (inclusive). """
+        for col in self._between(self.rows.get(row, ()), left, right):
+            yield self.cells[row, col]
+
+    def values(self):
+        """ Return all items, like a dictionary. """
+        return self.cells.values()
+
+    # Helpers .................................................................
+    @staticmethod
+    def _between(keys, low, high):
+        """ Slice a sorted list down to the values from low to high (inclusive). """
+        start = bisect_left(keys, low)
+        end = len(keys) if high is None else bisect_right(keys, high)
+        return keys[start:end]
+
+    @staticmethod
+    def _link(buckets, keys, key, value):
+        """ Add value to the sorted bucket for key, creating it if needed. """
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [value]
+            insort(keys, key)
+        else:
+            insort(bucket, value)
+
+    @staticmethod
+    def _unlink(buckets, keys, key, value):
+        """ Remove value from the bucket for key, dropping it when empty. """
+        bucket = buckets[key]
+        del bucket[bisect_left(bucket, value)]
+        if not bucket:
+            del buckets[key]
+            del keys[bisect_left(keys, key)]
+
+
+class GridModel:
+    """ The desktop grid, minus the display: cell geometry, the items by
+        position, the selection, and moving items or inserting rows and
+        columns. Items only need getPosition() and setPosition(row, col),
+        so WidgetFrames, WidgetRecords or plain objects do. If setPosition()
+        takes save=False, moves pass it, leaving saving to the desktop. """
+
+    def __init__(self, rows=GRIDROWS, cols=GRIDCOLS):
+        self.gridRows = rows
+        self.gridCols = cols
+        self.widgetH = WIDGETHEIGHT
+        self.widgetW = WIDGETWIDTH
+        self.marginX = DESKTOPPADX
+        self.marginY = DESKTOPPADY
+        # How moves treat items already in the way
+        self.movePolicy = MOVEREJECT
+        self.cells = GridIndex()
+        self.selection = Selection(self)
+
+    def dropOffset(self, item, x, y):
+        """ Return the rows, cols an item moves when dropped at view x, y. """
+        row, col = self.gridPosition(x, y)
+        oldRow, oldCol = item.getPosition()
+        return row - oldRow, col - oldCol
+
+    def gridPosition(self, x, y):
+        """ Convert viewport x,y coordinates to widget position. """
+        col = int(x // (self.widgetW + self.marginX))
+        row = int(y // (self.widgetH + self.marginY))
+        return row, col
+
+    def insertColumns(self, atCol, count=1):
+        """ Add columns before atCol, shifting the items at or right of it.
+            Returns the items moved, or None (changing nothing) if blocked. """
+        positions = [position for position, _ in self.cells.rect(left=atCol)]
+        # Room for the shift, kept only if it succeeds
+        self.gridCols += count
+        moved = self.shift(positions, 0, count)
+        if moved is None:
+            self.gridCols -= count
+        return moved
+
+    def insertRows(self, atRow, count=1):
+        """ Add rows before atRow, shifting the items at or below it.
+            Returns the items moved, or None (changing nothing) if blocked. """
+        positions = [position for position, _ in self.cells.rect(top=atRow)]
+        # Room for the shift, kept only if it succeeds
+        self.gridRows += count
+        moved = self.shift(positions, count, 0)
+        if moved is None:
+            self.gridRows -= count
+        return moved
+
+    def move(self, rows=0, cols=0, policy=None):
+        """ Move the selected items by rows, cols. Returns the items moved
+            (including any swapped or pushed), or None if blocked. """
+        positions = [item.getPosition() for item in self.selection.items]
+        return self.shift(positions, rows, cols, policy)
+
+    def put(self, item):
+        """ Add an item at its position. """
+        self.cells.put(*item.getPosition(), item)
+
+    def remove(self, item):
+        """ Remove an item (and unselect it). """
+        self.cells.pop(*item.getPosition())
+        self.selection.remove(item)
+
+    def selectAll(self, active=True):
+        """ Select or unselect all items. Returns the items that changed. """
+        changed = list(self.cells.values()) if active else list(self.selection.items)
+        self.selection.clear()
+        if active:
+            for item in changed:
+                self.selection.add(item)
+        return changed
+
+    def selectRange(self, top=0, left=0, bottom=None, right=None):
+        """ Select the items in a rectangle, by default to the edges of the
+            grid. Only visits the items in it and the ones selected before.
+            Returns the items that were selected before but aren't now. """
+        previous = list(self.selection.items)
+        self.selection.clear()
+        # Ensure selection box is right-side-up
+        if bottom is not None and bottom < top:
+            top, bottom = bottom, top
+        if right is not None and right < left:
+            left, right = right, left
+        # Assume full extent of desktop, if missing
+        bottom = self.gridRows if bottom is None else bottom
+        right = self.gridCols if right is None else right
+        for _position, item in self.cells.rect(top, left, bottom, right):
+            self.selection.add(item)
+        return [item for item in previous if not self.selection.contains(item)]
+
+    def shift(self, positions, rows=0, cols=0, policy=None):
+        """ Move the items at these positions by rows, cols, handling items in
+            the way by policy (default: movePolicy). Returns the items moved,
+            or None (changing nothing) if blocked or off the grid. """
+        moves = self.cells.planMove(positions, rows, cols, policy or self.movePolicy,
+                                    self.gridRows, self.gridCols)
+        if moves is None:
+            return None
+        items = self.cells.applyMoves(moves)
+        for item, (_, (row, col)) in zip(items, moves):
+            if takesSave(type(item)):
+                item.setPosition(row, col, save=False)
+            else:
+                # An older setPosition(row, col) override, which saves itself
+                item.setPosition(row, col)
+            if self.selection.contains(item):
+                self.selection.invalidate()
+        return items
+
+    def viewPosition(self, row, col):
+        """ Return viewport coords based on grid position. """
+        x = col * (self.widgetW + self.marginX)
+        y = row * (self.widgetH + self.marginY)
+        return x, y
+
+    def viewSize(self):
+        """ Calculate viewport size from rows, cols and and widget sizes. """
+        h = (self.gridRows * (self.widgetH + self.marginY)) + self.marginY
+        w = (self.gridCols * (self.widgetW + self.marginX)) + self.marginX
+        return h, w
+
+
+@lru_cache(maxsize=None)
+def takesSave(itemClass):
+    """ Check if this class's setPosition() accepts a save keyword. """
+    parameters = signature(itemClass.setPosition).parameters.values()
+    return any(p.name == 'save' or p.kind == Parameter.VAR_KEYWORD for p in parameters)
+
+
+class Selection:
+    """ Holds selected widgets pending some operation, like moving,
+    deleting, updating or other batch operations, while keeping track of
+    position stats to check for collisions. Adding, removing and checking
+    widgets are O(1); the extents are kept up to date as widgets are added,
+    and only rescanned after a widget on the boundary is removed. """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        # Selected widgets, as an insertion-ordered set
+        self.items = {}
+        self.originWidget = None
+        self.top = None
+        self.left = None
+        self.bottom = None
+        self.right = None
+        self.stale = False
+        self.dragFrame = None
+
+    def add(self, widget):
+        """ Add a widget to the list and update bounding box stats. """
+        if widget in self.items:
+            return
+        self.items[widget] = None
+        if not self.stale:
+            self._extend(widget)
+
+    def clear(self):
+        """ Clear the selection buffer when done for reuse. """
+        self.items.clear()
+        self.originWidget = None
+        self.top = None
+        self.left = None
+        self.bottom = None
+        self.right = None
+        self.stale = False
+
+    def contains(self, widget):
+        """ Indicate if the widget is selected. """
+        return widget in self.items
+
+    def count(self):
+        """ Returns number of widgets currently selected. """
+        return len(self.items)
+
+    def getExtents(self):
+        """ Return extent in t,l,b,r form. """
+        if self.stale:
+            self._setExtents()
+        return self.top, self.left, self.bottom, self.right
+
+    def getOrigin(self):
+        """ Return the Shift-Click anchor: the selected widget last seen at
+            the top-left corner (None only if nothing is selected). """
+        if self.stale:
+            self._setExtents()
+        return self.originWidget
+
+    def invalidate(self):
+        """ Selected widgets have moved: rescan the extents when next asked. """
+        self.stale = True
+
+    def remove(self, widget):
+        """ Remove a widget from the list, if it is there. """
+        if widget not in self.items:
+            return
+        del self.items[widget]
+        if widget is self.originWidget:
+            # Pick a new origin from the widgets left
+            self.originWidget = None
+            self.stale = True
+        # Only a widget on the boundary can shrink the extents
+        row, col = widget.getPosition()
+        if row in (self.top, self.bottom) or col in (self.left, self.right):
+            self.stale = True
+
+    def _extend(self, widget):
+        """ Grow the extents to include this widget. """
+        row, col = widget.getPosition()
+        if self.top is None:
+            self.top, self.left, self.bottom, self.right = row, col, row, col
+        else:
+            self.top = min(self.top, row)
+            self.left = min(self.left, col)
+            self.bottom = max(self.bottom, row)
+            self.right = max(self.right, col)
+        # Set the selection origin to the top-left-most widget. If the corner
+        # moved to an empty cell, keep the last origin for Shift-Click anchoring
+        if (row, col) == (self.top, self.left):
+            self.originWidget = widget
+
+    def _setExtents(self):
+        """ Keep track of extents to check for position collisions on moves. """
+        origin = self.originWidget
+        self.originWidget = None
+        self.top = self.left = self.bottom = self.right = None
+        self.stale = False
+        for widget in self.items:
+            self._extend(widget)
+        # A still-selected origin stays the anchor
+        if origin in self.items:
+            self.originWidget = origin
@@ -8,7 +8,9 @@
 # Notes:
 #   - The Dialog class code was borrowed from an awesome example on
 #     effbot.org and evolved for my use (I cannot take credit for most of it).
+#   - TkPollTimer is the PollTimer to use for anything that touches widgets.
 
+import time
 from tkinter import Frame, TOP, Button, BOTTOM, Toplevel, PhotoImage, Label, \
     Radiobutton, Spinbox, FLAT
 from tkinter import HORIZONTAL, RIGHT, INSERT, NORMAL, DISABLED, END, SEL, Text
@@ -290,7 +292,10 @@ class ModalDialog(Toplevel):
 
 
 class DraggableFrame(Frame):
-    """ A frame with built-in drag and drop functionality. """
+    """ A frame with built-in drag and drop functionality. Mouse motion is
+        coalesced: only the latest position is drawn, at most <dragFps> times
+        a second. Set <dragGhost> to drag a plain outline box instead of the
+        frame (and all its children), placing the frame only on drop. """
 
     def __init__(self, parent, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
@@ -303,10 +308,25 @@ class DraggableFrame(Frame):
         self.dropEvent = None
         self.dragInProgess = False
         self.clickSpecial = False
+        self.dragFps = DRAGFPS
+        self.dragGhost = False
+        self.dragPending = None
+        self.ghost = None
         # Bind mouseclick events
         self.bind('<Button-1>', self.onDragStart)
         self.bind('<B1-Motion>', self.onDragMotion)
-        self.bind('<ButtonRelease-1>', self.onDrop)
+        self.bind('<ButtonRelease-1>', self.onDragStop)
+
+    @property
+    def dragFps(self):
+        """ Most drag positions drawn per second. """
+        return self._dragFps
+
+    @dragFps.setter
+    def dragFps(self, fps):
+        if fps <= 0:
+            raise ValueError('dragFps must be positive, not {}'.format(fps))
+        self._dragFps = fps
 
     def bindMouseToParent(self, widget):
         """ Allows drag motion to 'pass-thru' a widget to its parent. """
@@ -323,6 +343,32 @@ class DraggableFrame(Frame):
         self.newX = self.winfo_x() - self.startX + event.x
         self.newY = self.winfo_y() - self.startY + event.y
 
+    def dropGhost(self):
+        """ Remove the drag ghost, if any. """
+        if self.ghost is not None:
+            self.ghost.destroy()
+            self.ghost = None
+
+    def makeGhost(self):
+        """ Create the drag ghost: an empty outline the size of this frame.
+            (Tk draws frames over canvas items, so it can't be a rectangle on
+            a ScrollFrame canvas while the frame is on its viewport.) """
+        self.ghost = Frame(self.master, bg=self.cget('bg'), highlightthickness=2,
+                           highlightbackground=GHOSTCOLOR)
+        self.ghost.place(x=self.winfo_x(), y=self.winfo_y(),
+                         width=self.winfo_width(), height=self.winfo_height())
+
+    def moveDrag(self):
+        """ Draw the latest drag position: move the ghost, or the frame. """
+        self.dragPending = None
+        if self.dragGhost:
+            if self.ghost is None:
+                self.makeGhost()
+            self.ghost.place(x=self.newX, y=self.newY)
+            self.ghost.tkraise()
+        else:
+            self.place(x=self.newX, y=self.newY)
+
     def onClick(self, event):
         """ Override this in subclass to handle click event. """
         pass
@@ -348,9 +394,10 @@ class DraggableFrame(Frame):
         """ Mouse is dragging this frame, begin drag operation. """
         if not self.clickSpecial:
             self.dragInProgess = True
-            # Move item with mouse
+            # Move item with mouse, once per frame at most
             self.dragPosition(event)
-            self.place(x=self.newX, y=self.newY)
+            if self.dragPending is None:
+                self.dragPending = self.after(1000 // self.dragFps, self.moveDrag)
 
     def onDragStart(self, event):
         """ Mouse button-down, save start location. """
@@ -364,6 +411,11 @@ class DraggableFrame(Frame):
 
     def onDragStop(self, event):
         """ Mouse released, drop here (if drag occured). """
+        if self.dragPending is not None:
+            # Draw the last position now, not after the drop
+            self.after_cancel(self.dragPending)
+            self.moveDrag()
+        self.dropGhost()
         if self.dragInProgess:
             self.newX += self.startX
             self.newY += self.startY
@@ -401,8 +453,8 @@ class ScrollFrame(Frame):
         self.viewport = Frame(self.canvas, highlightthickness=0)
         self.widget = None
         # Create and attach scrollbars
-        self.scrollV = Scrollbar(self, orient=VERTICAL, command=self.canvas.yview)
-        self.scrollH = Scrollbar(self, orient=HORIZONTAL, command=self.canvas.xview)
+        self.scrollV = Scrollbar(self, orient=VERTICAL, command=self.scrollY)
+        self.scrollH = Scrollbar(self, orient=HORIZONTAL, command=self.scrollX)
         self.canvas.configure(yscrollcommand=self.scrollV.set)
         self.canvas.configure(xscrollcommand=self.scrollH.set)
         # Pack canvas and scrollbars to appropriate sides
@@ -430,6 +482,24 @@ class ScrollFrame(Frame):
         # For Windows
         widget.bind("<MouseWheel>", self.onMouseWheel)
 
+    def scrollX(self, *args):
+        """ Horizontal scrollbar command: scroll, then report the new view. """
+        self.canvas.xview(*args)
+        self.onViewChanged()
+
+    def scrollY(self, *args):
+        """ Vertical scrollbar command: scroll, then report the new view. """
+        self.canvas.yview(*args)
+        self.onViewChanged()
+
+    def visibleRegion(self):
+        """ Return the x1, y1, x2, y2 area of the viewport currently in view. """
+        # No viewport window when drawing on the canvas itself
+        offsetX, offsetY = self.canvas.coords(self.canvasWin) or (0, 0)
+        x = self.canvas.canvasx(0) - offsetX
+        y = self.canvas.canvasy(0) - offsetY
+        return x, y, x + self.canvas.winfo_width(), y + self.canvas.winfo_height()
+
     def onCanvasEntered(self, _event):
         """ Bind mousewheel to scroll when mouse is over canvas. """
         # For Linux
@@ -449,6 +519,7 @@ class ScrollFrame(Frame):
     def onCanvasResize(self, event):
         """ Reset the canvas window to encompass inner frame when required. """
         self.canvas.itemconfig(self.canvasWin, width=event.width)
+        self.onViewChanged()
 
     def onDrop(self, widget, x, y):
         """ Override in subclass to handle drop event (see DraggableFrame). """
@@ -461,6 +532,11 @@ class ScrollFrame(Frame):
             self.canvas.yview_scroll(-1, "units")
         elif event.num == 5 or event.delta == -120:
             self.canvas.yview_scroll(1, "units")
+        self.onViewChanged()
+
+    def onViewChanged(self):
+        """ Override in subclass to follow scrolling and resizing. """
+        pass
 
     def onViewportResize(self, _event):
         """ Reset the scroll region to encompass the inner frame. """
@@ -536,3 +612,117 @@ class TextBox(Text):
             self.parent.focus()
         # Stop input from reaching text field
         return "break"
+
+
+class TkPollTimer:
+    """ Repeating timer like util.PollTimer (every <interval> minutes), but
+    driven by widget.after(), so func runs on the Tk thread and may touch
+    widgets. Given an <executor> (a concurrent.futures pool), func runs there
+    instead, and only <done>(result) comes back to the Tk thread. Ticks that
+    come while a run is still going are skipped (and counted).
+    Usage:
+        # Start an auto-save timer
+        self.saveTimer = TkPollTimer(self, self.saveInterval, self.desktop.save)
+        self.saveTimer.start()
+    """
+
+    def __init__(self, widget, interval, func, *args, executor=None, done=None,
+                 **kwargs):
+        if interval <= 0:
+            raise ValueError('TkPollTimer interval must be positive, not {}'.format(interval))
+        self.widget = widget
+        self.interval = interval * 60
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.executor = executor
+        self.done = done
+        # The time of the next tick, and the after() ids to cancel
+        self.base = None
+        self.tickId = None
+        self.pollId = None
+        self.active = False
+        # The run in flight: a background future, or a call on the Tk thread
+        self.future = None
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+
+    def cancel(self):
+        """ Shut down the poll timer. A background run already going is left
+            to finish, but its result is dropped (done() isn't called). """
+        self.active = False
+        if self.tickId:
+            self.widget.after_cancel(self.tickId)
+            self.tickId = None
+        if self.pollId:
+            self.widget.after_cancel(self.pollId)
+            self.pollId = None
+        if self.future is not None:
+            self.future.cancel()
+
+    def isBusy(self):
+        """ True while a run is in flight or its result not yet passed on
+            (counting one cancel() dropped, so a restart can't overlap it). """
+        if self.running or self.pollId is not None:
+            return True
+        return self.future is not None and not self.future.done()
+
+    def pollResult(self):
+        """ Back on the Tk thread: pass on the background result, when ready. """
+        self.pollId = None
+        if not self.future.done():
+            self.pollId = self.widget.after(TKPOLLMS, self.pollResult)
+            return
+        future = self.future
+        self.future = None
+        self.runs += 1
+        # An exception goes to Tk's callback error reporting, like any handler
+        result = future.result()
+        if self.done:
+            self.done(result)
+
+    def runSync(self):
+        """ Run func right here on the Tk thread, and pass on its result. """
+        self.running = True
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        finally:
+            self.running = False
+        self.runs += 1
+        if self.done:
+            self.done(result)
+
+    def schedule(self):
+        """ Book the next tick, keeping to the original beat. """
+        now = time.monotonic()
+        self.base += self.interval
+        if self.base < now:
+            # The Tk thread was held up past whole ticks; don't run them late
+            missed = int((now - self.base) // self.interval) + 1
+            self.skipped += missed
+            self.base += missed * self.interval
+        self.tickId = self.widget.after(int((self.base - now) * 1000), self.tick)
+
+    def start(self):
+        """ Start the poll timer. """
+        self.active = True
+        self.base = time.monotonic()
+        self.schedule()
+
+    def tick(self):
+        """ Run func (unless the last run is still going), then book the next
+            tick, after the run so a slow one skips the ticks it held up. """
+        self.tickId = None
+        try:
+            if self.isBusy():
+                self.skipped += 1
+            elif self.executor:
+                self.future = self.executor.submit(self.func, *self.args, **self.kwargs)
+                self.pollId = self.widget.after(TKPOLLMS, self.pollResult)
+            else:
+                self.runSync()
+        finally:
+            # Unless func (or done) cancelled the timer
+            if self.active:
+                self.schedule()
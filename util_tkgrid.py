@@ -9,10 +9,25 @@
 # Notes:    - Initially extracted from desktop.py in Cardz project.
 #           - Todo: Widgets do not need to know their position (row,col),
 #               that's the Desktop's thing.
+#           - Virtual mode: the desktop holds WidgetRecords, and only the ones
+#               in view (plus an overscan margin) get a WidgetFrame, taken
+#               from a pool of recycled frames as the view scrolls.
+#           - arrange() only queues work: one layout() pass, when the event
+#               loop is idle, re-places the widgets marked since the last one.
+#           - The grid logic itself (geometry, widget index, selection, moves)
+#               lives in util_grid.GridModel; DesktopFrame displays it.
+#           - CanvasDesktopFrame draws cards as canvas items instead of frames,
+#               with one real WidgetFrame for the focused card.
+#           - setZoom() scales the grid; CanvasDesktopFrame also drops detail
+#               as it zooms out: full widgets, then labels, then color blocks.
 #
-from tkinter import FLAT, IntVar, StringVar
+import warnings
+from tkinter import FLAT, HIDDEN, NORMAL, NW, IntVar, StringVar
 
-from Util.globals import GRIDROWS, DESKTOPPADX, WIDGETWIDTH, WIDGETHEIGHT, GRIDCOLS, DESKTOPPADY, DESKTOPBG, AFTER
+from Util.globals import DESKTOPBG, AFTER, DESKTOPOVERSCAN, CARDOUTLINE, CARDHILIGHT, CARDTEXTPAD, DRAGFPS, \
+    LODBLOCKS, LODLABELS, LODFULL, ZOOMLABELS, ZOOMFULL
+# Selection moved to util_grid; still importable from here
+from Util.util_grid import GridModel, Selection
 from Util.util_tk import DraggableFrame, ScrollFrame, askAtRowsOrColumns
 
 
@@ -21,7 +36,7 @@ class WidgetFrame(DraggableFrame):
 
     def __init__(self, parent, row, col, fg='black', bg='white', bd=0,
                  hlbg='black', hlfg='cyan'):
-        super().__init__(parent.viewport, bg=bg, bd=bd, relief=FLAT,
+        super().__init__(parent.frameMaster(), bg=bg, bd=bd, relief=FLAT,
                          highlightbackground=hlbg, highlightcolor=hlfg,
                          highlightthickness=3)
         self.parent = parent
@@ -34,6 +49,8 @@ class WidgetFrame(DraggableFrame):
         self.hlfg = hlfg
         self.oldRow = -1
         self.oldCol = -1
+        # The WidgetRecord shown, in virtual mode
+        self.record = None
         # Bind mouse and keyboard events to controls
         self.bind('<Button-3>', self.onRightClick)
         # Pass mouse scroll bindings through widget to the desktop viewport
@@ -47,21 +64,28 @@ class WidgetFrame(DraggableFrame):
         self.bindMouseToParent(control)
         self.parent.bindScrollToViewport(control)
 
+    def bindRecord(self, record):
+        """ Virtual mode: show this record. Override to also show the app's
+            own record data, calling this first. """
+        self.record = record
+        record.frame = self
+        self._row, self._col = record.getPosition()
+        self.config(background=record.color)
+        self.setSelected(record.selected)
+
     def getColor(self):
         """ Return current widget color value. """
         return self.cget('bg')
 
     def getPosition(self):
-        """ Get current position, ignoring hidden (negative) status. """
-        return abs(self._row), abs(self._col)
+        """ Get current position. """
+        return self._row, self._col
 
     def hide(self):
-        """ Temporarily hide a widget in the database (by setting its keys
-        negative) to open that key for saving another widget when moving
-        multiple widgets, to avoid duplicate key conflicts.
-        To unhide:  widget.position(newRow, newCol) saves the widget at this
-        new position. Never deliberately leave widgets in a hidden state. """
-        # todo: this will become obsolete soon.
+        """ Deprecated: moves no longer need widgets hidden out of the way.
+        Sets the keys negative and saves, as it always did. """
+        warnings.warn('WidgetFrame.hide() is obsolete; DesktopFrame.move() '
+                      'no longer needs it.', DeprecationWarning, stacklevel=2)
         self._row = -self._row
         self._col = -self._col
         self.save()
@@ -79,22 +103,34 @@ class WidgetFrame(DraggableFrame):
         self.config(background=color)
         self.save()
 
-    def setPosition(self, row, col):
-        """  Set a new position and save. """
+    def setPosition(self, row, col, save=True):
+        """  Set a new position and save (unless saved in a batch by the desktop). """
         self._row = row
         self._col = col
-        self.save()
+        if save:
+            self.save()
+
+    def target(self):
+        """ Return what the desktop tracks for this frame: its record in
+            virtual mode, otherwise the frame itself. """
+        return self.record if self.record is not None else self
+
+    def unbindRecord(self):
+        """ Virtual mode: stop showing the current record. """
+        if self.record is not None:
+            self.record.frame = None
+            self.record = None
 
     # Event Handlers ..........................................................
     def onClick(self, _event):
         """ Select a single widget, making it the origin for block-selects.
             Call from overridden method, where needed. """
         self.parent.selectAll(False)
-        self.parent.selectOne(self)
+        self.parent.selectOne(self.target())
 
     def onCtrlClick(self, _event):
         """ Toggle selection of this widget randomly. """
-        self.parent.selectToggle(self)
+        self.parent.selectToggle(self.target())
 
     def onDoubleClick(self, _event):
         """ Override to perform custom action for application. """
@@ -107,14 +143,15 @@ class WidgetFrame(DraggableFrame):
 
     def onDrop(self, event):
         """ If moved, pass drop to desktop to update widget's position. """
-        if self._row != self.oldRow or self._col != self.oldCol:
+        row, col = self.parent.gridPosition(*self.parent.viewCoords(self.newX, self.newY))
+        if row != self.oldRow or col != self.oldCol:
             self.oldRow, self.oldCol = -1, -1
-            self.parent.onDrop(self, self.newX, self.newY)
+            self.parent.onDrop(self.target(), self.newX, self.newY)
             # Valid drop
             return True
         else:
             # Clean up inadvertent mini-drag
-            self.parent.arrange()
+            self.parent.arrange(self.target())
             self.onClick(event)
             return False
 
@@ -124,26 +161,51 @@ class WidgetFrame(DraggableFrame):
 
     def onShiftClick(self, _event):
         """ Block selects widgets, if an origin has been set. """
-        self.parent.selectBlock(self)
+        self.parent.selectBlock(self.target())
+
+
+def modelAttribute(name):
+    """ A DesktopFrame attribute kept in (read from and written to) its GridModel. """
+    return property(lambda self: getattr(self.model, name),
+                    lambda self, value: setattr(self.model, name, value))
 
 
 class DesktopFrame(ScrollFrame):
     """ A frame that automagically aligns widget-like widgets in rows and columns.
         NOTE: Must place widgets on self.viewport, not self. """
-
-    def __init__(self, parent, parentFrame, **kw):
+    gridRows = modelAttribute('gridRows')
+    gridCols = modelAttribute('gridCols')
+    widgetH = modelAttribute('widgetH')
+    widgetW = modelAttribute('widgetW')
+    marginX = modelAttribute('marginX')
+    marginY = modelAttribute('marginY')
+    # How move() and drops treat widgets already in the way
+    movePolicy = modelAttribute('movePolicy')
+    widgets = property(lambda self: self.model.cells)
+    selections = property(lambda self: self.model.selection)
+
+    def __init__(self, parent, parentFrame, virtual=False, overscan=DESKTOPOVERSCAN, **kw):
         super().__init__(parentFrame, **kw)
         self.parent = parent
-        self.gridRows = GRIDROWS
-        self.gridCols = GRIDCOLS
-        self.widgetH = WIDGETHEIGHT
-        self.widgetW = WIDGETWIDTH
-        self.marginX = DESKTOPPADX
-        self.marginY = DESKTOPPADY
+        self.model = GridModel()
         self.bgColor = DESKTOPBG
         self.bgImage = None
-        self.widgets = {}
-        self.selections = Selection(self)
+        # Zoom: sizes at 1:1 (while zoomed), and the zoom needed for each detail tier
+        self.zoom = 1.0
+        self.baseSizes = None
+        self.zoomLabels = ZOOMLABELS
+        self.zoomFull = ZOOMFULL
+        self.detail = LODFULL
+        # Virtual mode: widgets holds WidgetRecords, shown by pooled frames
+        self.virtual = virtual
+        self.overscan = overscan
+        self.frames = {}
+        self.framePool = []
+        # Widgets waiting for the next layout pass (or all of them)
+        self.dirty = set()
+        self.layoutAll = True
+        self.layoutPending = None
+        self.viewState = None
         # Display an empty grid space on viewport
         self.arrange()
         # Bind mouseclick events
@@ -163,12 +225,9 @@ class DesktopFrame(ScrollFrame):
                 atCol = self.gridCols + 1
             elif side.get() == AFTER:
                 atCol += 1
-            # Bump up the max desktop columns and save
-            self.gridCols += cols.get()
+            # Bump up the max desktop columns, shifting widgets to make space
+            self.moved(self.model.insertColumns(atCol, cols.get()))
             self.save()
-            # Shift widgets to make space, if necessary, and save changes
-            self.selectRange(left=atCol, hilight=False)
-            self.move(cols=cols.get())
 
     def addRows(self, atRow=None):
         """ Insert a new row at this row, or after the last row (default). """
@@ -181,25 +240,27 @@ class DesktopFrame(ScrollFrame):
                 atRow = self.gridRows + 1
             elif side.get() == AFTER:
                 atRow += 1
-            # Bump up the max rows and save
-            self.gridRows += rows.get()
+            # Bump up the max rows, shifting widgets to make space
+            self.moved(self.model.insertRows(atRow, rows.get()))
             self.save()
-            # Shift widgets to make space, if necessary and save changes
-            self.selectRange(top=atRow, hilight=False)
-            self.move(rows=rows.get())
 
-    def arrange(self):
-        """ Arrange and resize widgets and canvas viewport. """
-        # Resize the viewport
-        h, w = self.viewSize()
-        self.viewport.config(height=h, width=w, bg=self.bgColor)
-        # Place each widget where it belongs
-        for key, widget in self.widgets.items():
-            x, y = self.viewPosition(*widget.getPosition())
-            widget.place(x=x, y=y, height=self.widgetH, width=self.widgetW)
+    def arrange(self, *widgets):
+        """ Arrange and resize widgets and canvas viewport: marks these widgets
+            for re-placing, and queues one layout() pass for when the event loop
+            is idle, however many times this is called before then. """
+        self.dirty.update(widgets)
+        if self.layoutPending is None:
+            self.layoutPending = self.after_idle(self.layout)
 
     def clear(self):
         """ Clears widgets from desktop, without deleting from their database. """
+        self.dirty.clear()
+        if self.virtual:
+            # Keep the frames in the pool for the next set of records
+            for record in list(self.frames):
+                self.releaseFrame(record)
+            self.widgets.clear()
+            return
         for widget in self.widgets.values():
             # Unplace and delete each widget widget
             widget.place_forget()
@@ -207,71 +268,159 @@ class DesktopFrame(ScrollFrame):
         # Clear the list
         self.widgets.clear()
 
+    def firstFree(self, row=0, col=0):
+        """ Return the first empty grid position at or after this one. """
+        return self.widgets.firstFree(row, col, width=self.gridCols)
+
+    def frameMaster(self):
+        """ Return the Tk parent for WidgetFrames: the viewport. """
+        return self.viewport
+
+    def detailFor(self, zoom):
+        """ Return the level of detail tier to draw at this zoom. """
+        if zoom >= self.zoomFull:
+            return LODFULL
+        return LODLABELS if zoom >= self.zoomLabels else LODBLOCKS
+
     def getWidgetAt(self, row, col):
         """ Return the widget at this position, if one exists there. """
-        return self.widgets.get(self.key(row, col))
+        return self.widgets.get(row, col)
 
     def gridPosition(self, x, y):
         """ Convert viewport x,y coordinates to widget position. """
-        col = x // (self.widgetW + self.marginX)
-        row = y // (self.widgetH + self.marginY)
-        return row, col
+        return self.model.gridPosition(x, y)
 
     @staticmethod
     def key(row, col):
-        """ Return a dictionary key based on this position "RRR:CCC" """
-        return "{:03d}:{:03d}".format(row, col)
+        """ Return the widget index key for this position. """
+        return row, col
 
-    def move(self, rows=0, cols=0):
-        """ Move selected widgets to a new location. """
-        # Todo: Check destination is clear (and deal with it)
-        # Cut affected widgets from desktop/database
-        for widget in self.selections.items:
-            self.removeWidget(widget)
-            widget.hide()
-        # Paste each widget at new position
-        for widget in self.selections.items:
-            row, col = widget.getPosition()
-            widget.setPosition(row + rows, col + cols)
-            self.putWidget(widget)
-        # Redraw all widgets in new places and clear selections
-        self.arrange()
+    def layout(self):
+        """ Resize the viewport if needed and re-place the widgets marked by
+            arrange() and putWidget(), or every widget after a size change. """
+        if self.layoutPending is not None:
+            self.after_cancel(self.layoutPending)
+            self.layoutPending = None
+        # Resize the viewport
+        viewState = self.viewSize(), self.bgColor
+        if viewState != self.viewState:
+            self.viewState = viewState
+            h, w = viewState[0]
+            self.viewport.config(height=h, width=w, bg=self.bgColor)
+        dirty, self.dirty = self.dirty, set()
+        layoutAll, self.layoutAll = self.layoutAll, False
+        if self.virtual:
+            self.refreshView(dirty, layoutAll)
+            return
+        # Place each widget where it belongs
+        for widget in self.widgets.values() if layoutAll else dirty:
+            self.placeWidget(widget)
+
+    def move(self, rows=0, cols=0, policy=None):
+        """ Move selected widgets by rows, cols. Widgets in the way are
+            handled by policy (default: movePolicy); see GridIndex.planMove().
+            All new positions are saved with one saveWidgets() call.
+            Returns False, changing nothing, if the move is blocked. """
+        return self.moved(self.model.move(rows, cols, policy))
+
+    def moved(self, widgets):
+        """ Save and redraw widgets the model just moved (None if it didn't),
+            and clear selections. Returns whether anything could move. """
+        if widgets is None:
+            return False
+        self.saveWidgets(widgets)
+        self.arrange(*widgets)
         self.selectAll(False)
+        return True
+
+    def newFrame(self):
+        """ Virtual mode: create a frame for the pool. Override to create the
+            app's own WidgetFrame subclass. """
+        return WidgetFrame(self, 0, 0)
 
     def popWidget(self, row, col):
         """ Remove widget from widget collection and return it. """
-        key = self.key(row, col)
-        widget = self.widgets[key]
-        del self.widgets[key]
+        widget = self.widgets.pop(row, col)
+        if self.virtual:
+            self.releaseFrame(widget)
         return widget
 
+    def placeWidget(self, widget):
+        """ Place a widget (or a record's frame) at its grid position, if it is
+            still on the desktop. """
+        position = widget.getPosition()
+        if self.widgets.get(*position) is not widget:
+            return
+        if self.virtual:
+            widget = self.frames.get(widget)
+            if widget is None:
+                return
+        x, y = self.viewPosition(*position)
+        widget.place(x=x, y=y, height=self.widgetH, width=self.widgetW)
+
     def putWidget(self, widget):
-        """ Add widget to the widget collection. """
-        key = self.key(*widget.getPosition())
-        self.widgets[key] = widget
+        """ Add widget to the widget collection, to be placed by the next layout. """
+        self.widgets.put(*widget.getPosition(), widget)
+        self.dirty.add(widget)
+
+    def refreshView(self, dirty=(), layoutAll=False):
+        """ Virtual mode: give a frame to each record in view (plus the overscan
+            margin), recycling the frames of records that went out of view.
+            Frames already in place are only re-placed if their record is dirty,
+            or for layoutAll. """
+        inView = [record for _, record in self.widgets.rect(*self.visibleRange())]
+        keep = set(inView)
+        for record in [record for record in self.frames if record not in keep]:
+            self.releaseFrame(record)
+        for record in inView:
+            if record not in self.frames:
+                frame = self.framePool.pop() if self.framePool else self.newFrame()
+                frame.bindRecord(record)
+                self.frames[record] = frame
+            elif not layoutAll and record not in dirty:
+                continue
+            self.placeWidget(record)
+
+    def releaseFrame(self, record):
+        """ Virtual mode: hide the frame showing this record (if any) and
+            return it to the pool. """
+        frame = self.frames.pop(record, None)
+        if frame is not None:
+            frame.unbindRecord()
+            frame.place_forget()
+            self.framePool.append(frame)
 
     def removeWidget(self, widget):
-        """ Remove a widget from the desktop collection. """
-        key = self.key(*widget.getPosition())
-        del self.widgets[key]
+        """ Remove a widget from the desktop collection (and the selection). """
+        self.model.remove(widget)
+        if self.virtual:
+            self.releaseFrame(widget)
 
     def resizeWidgets(self, height, width):
         """ Scale size of all widgets and refresh the grid. """
-        self.widgetH = height
-        self.widgetW = width
+        self.setWidgetSize(height, width)
         self.arrange()
         self.save()
 
+    def resetZoom(self):
+        """ Sizes were set directly: make them the new 1:1 zoom. """
+        self.zoom = 1.0
+        self.baseSizes = None
+
     def save(self):
         """ Override to save on changes to Desktop subclass. """
         pass
 
+    def saveWidgets(self, widgets):
+        """ Save a batch of changed widgets. Override to save them all at once
+            (eg, in one database transaction); by default each one saves itself. """
+        for widget in widgets:
+            widget.save()
+
     def selectAll(self, active=True):
-        """ Select or unselect all widgets, hilighting accordingly. """
-        self.selections.clear()
-        for widget in self.widgets.values():
-            if active:
-                self.selections.add(widget)
+        """ Select or unselect all widgets, hilighting accordingly. Unselecting
+            only touches the widgets that were selected. """
+        for widget in self.model.selectAll(active):
             widget.setSelected(active)
         self.selectState(active)
 
@@ -279,7 +428,7 @@ class DesktopFrame(ScrollFrame):
         """ Select a range from origin widget to this one (Shift-Click). """
         if self.selections.getOrigin():
             # Select all widgets in a box from the origin to this widget
-            top, left = self.selections.origin.getPosition()
+            top, left = self.selections.getOrigin().getPosition()
             bottom, right = widget.getPosition()
             self.selectRange(top, left, bottom, right)
         else:
@@ -295,25 +444,14 @@ class DesktopFrame(ScrollFrame):
         self.selectState(True)
 
     def selectRange(self, top=0, left=0, bottom=None, right=None, hilight=True):
-        """ Select a group of widgets in a rectangular area and hilight them. """
-        self.selections.clear()
-        # Ensure selection box is right-side-up
-        if bottom and bottom < top:
-            top, bottom = bottom, top
-        if right and right < left:
-            left, right = right, left
-        # Assume full extent of desktop, if missing
-        bottom = self.gridRows if not bottom else bottom
-        right = self.gridCols if not right else right
-        # Select widgets that fall in this rectangle
-        for widget in self.widgets.values():
-            row, col = widget.getPosition()
-            if left <= col <= right and top <= row <= bottom:
-                self.selections.add(widget)
-                # Hilight widget, if not a background operation (eg, insert row)
-                widget.setSelected(hilight)
-            else:
-                widget.setSelected(False)
+        """ Select a group of widgets in a rectangular area and hilight them.
+            Only the widgets in the area, and those previously selected, are
+            visited. """
+        for widget in self.model.selectRange(top, left, bottom, right):
+            widget.setSelected(False)
+        for widget in self.selections.items:
+            # Hilight widget, if not a background operation
+            widget.setSelected(hilight)
         # Abort editing one single widget; show colorbar
         self.focus_set()
         self.selectState(self.selections.count() > 0)
@@ -351,23 +489,60 @@ class DesktopFrame(ScrollFrame):
         """ Set between-widget margin sizes; x = to left, y = above. """
         self.marginX = x
         self.marginY = y
+        self.layoutAll = True
+        self.resetZoom()
+
+    def setDetail(self, detail):
+        """ Switch level of detail tier. WidgetFrames only come in full detail,
+            so this just records it; see CanvasDesktopFrame. """
+        self.detail = detail
 
     def setWidgetSize(self, height, width):
         """ Set the size of widgets occupying the desktop. """
         self.widgetH = height
         self.widgetW = width
+        self.layoutAll = True
+        self.resetZoom()
+
+    def setZoom(self, zoom):
+        """ Scale widgets and margins to zoom (1.0 being their size before
+            zooming), switching detail tier to suit. Redraws only what is in
+            view in virtual mode, and doesn't save anything. """
+        if self.baseSizes is None:
+            self.baseSizes = self.widgetH, self.widgetW, self.marginX, self.marginY
+        height, width, marginX, marginY = self.baseSizes
+        self.widgetH = max(1, round(height * zoom))
+        self.widgetW = max(1, round(width * zoom))
+        self.marginX = round(marginX * zoom)
+        self.marginY = round(marginY * zoom)
+        self.zoom = zoom
+        self.layoutAll = True
+        detail = self.detailFor(zoom)
+        if detail != self.detail:
+            self.setDetail(detail)
+        self.arrange()
+
+    def viewCoords(self, x, y):
+        """ Convert coords on frameMaster() (where WidgetFrames are dragged)
+            to viewport coords. They're the same here. """
+        return x, y
 
     def viewPosition(self, row, col):
         """ Return viewport coords based on grid position. """
-        x = col * (self.widgetW + self.marginX)
-        y = row * (self.widgetH + self.marginY)
-        return x, y
+        return self.model.viewPosition(row, col)
 
     def viewSize(self):
         """ Calculate viewport size from rows, cols and and widget sizes. """
-        h = (self.gridRows * (self.widgetH + self.marginY)) + self.marginY
-        w = (self.gridCols * (self.widgetW + self.marginX)) + self.marginX
-        return h, w
+        return self.model.viewSize()
+
+    def visibleRange(self):
+        """ Return the top, left, bottom, right grid cells in view, widened by
+            the overscan margin. """
+        x1, y1, x2, y2 = self.visibleRegion()
+        top, left = self.gridPosition(x1, y1)
+        bottom, right = self.gridPosition(x2, y2)
+        return (max(0, int(top) - self.overscan), max(0, int(left) - self.overscan),
+                int(bottom) + self.overscan, int(right) + self.overscan)
 
     # Event handlers ..........................................................
     def onClick(self, _event):
@@ -380,87 +555,387 @@ class DesktopFrame(ScrollFrame):
         pass
 
     def onDrop(self, widget, x, y):
-        """ Called from DraggableFrame upon dropping a dragged child widget. """
+        """ Called from DraggableFrame upon dropping a dragged child widget.
+            Moves the selection (or just this widget, if it isn't selected) by
+            the distance dragged, putting it back if the move is blocked. """
         # Todo: New code to determine drop-on-margin-or-widget goes here
-        row, col = self.gridPosition(x, y)
-        found = self.getWidgetAt(row, col)
-        if found:
-            if found != widget:
-                # Another widget exists there. TODO: Ask user what to do now
-                pass
-        else:  # All clear, drop it here
-            self.move(row, col)
+        rows, cols = self.model.dropOffset(widget, x, y)
+        if not self.selections.contains(widget):
+            self.selectAll(False)
+            self.selectOne(widget)
+        if not self.move(rows, cols):
+            self.arrange(widget)
 
     def onRightClick(self, _event):
         """ Override for custom functionality. """
         pass
 
+    def onViewChanged(self):
+        """ Scrolled or resized: in virtual mode, show what's now in view. """
+        if self.virtual:
+            self.refreshView()
+
+
+class CanvasDesktopFrame(DesktopFrame):
+    """ A DesktopFrame that draws cards (WidgetRecords) as a rectangle plus
+        text on its canvas, which Tk handles far better than thousands of
+        frames. Like virtual mode, only the cards in view get drawn. The one
+        focused card gets a real WidgetFrame (see newEditFrame()) over it, for
+        editing. Override cardLabel() for the text shown.
+        Zoomed to zoomFull or more, every card in view is a WidgetFrame (pass
+        a higher zoomFull to keep drawing cards at 1:1); zoomed out, cards show
+        their label, then (below zoomLabels) just their color. """
+
+    def __init__(self, parent, parentFrame, zoomFull=ZOOMFULL, **kw):
+        self.editFrame = None
+        self.editWindow = None
+        self.focused = None
+        # Idle card drawings of the kind not used at the current detail tier
+        self.otherPool = []
+        # Canvas-item drag state
+        self.dragRecord = None
+        self.dragStart = None
+        self.dragLast = None
+        self.dragDrawn = None
+        self.dragPending = None
+        self.dragFps = DRAGFPS
+        super().__init__(parent, parentFrame, virtual=True, **kw)
+        self.zoomFull = zoomFull
+        self.detail = self.detailFor(self.zoom)
+        # Cards are drawn on the canvas, so drop the viewport window
+        self.canvas.delete(self.canvasWin)
+        self.bindScrollToViewport(self.canvas)
+        self.canvas.bind('<Button-1>', self.onCanvasPress)
+        self.canvas.bind('<B1-Motion>', self.onCanvasMotion)
+        self.canvas.bind('<ButtonRelease-1>', self.onCanvasRelease)
+        self.canvas.bind('<Shift-Button-1>', self.onCanvasShiftClick)
+        self.canvas.bind('<Control-Button-1>', self.onCanvasCtrlClick)
+        self.canvas.bind('<Double-Button-1>', self.onDoubleClick)
+        self.canvas.bind('<Button-3>', self.onRightClick)
+
+    @property
+    def dragFps(self):
+        """ Most card drag positions drawn per second. """
+        return self._dragFps
+
+    @dragFps.setter
+    def dragFps(self, fps):
+        if fps <= 0:
+            raise ValueError('dragFps must be positive, not {}'.format(fps))
+        self._dragFps = fps
+
+    def cardAt(self, x, y):
+        """ Return the card under canvas widget coordinates x, y (or None),
+            using the grid math rather than asking the canvas. """
+        x, y = self.canvas.canvasx(x), self.canvas.canvasy(y)
+        row, col = self.gridPosition(x, y)
+        left, top = self.viewPosition(row, col)
+        if x - left >= self.widgetW or y - top >= self.widgetH:
+            # In the margin
+            return None
+        return self.widgets.get(row, col)
 
-class Selection:
-    """ Holds selected widgets pending some operation, like moving,
-    deleting, updating or other batch operations, while keeping track of
-    position stats to check for collisions. """
-
-    def __init__(self, parent):
-        self.parent = parent
-        self.items = []
-        self.originWidget = None
-        self.top = None
-        self.left = None
-        self.bottom = None
-        self.right = None
-        self.dragFrame = None
-
-    def add(self, widget):
-        """ Add a widget to the list and update bounding box stats. """
-        if not self.items.__contains__(widget):
-            self.items.append(widget)
-        self._setExtents()
+    def cardLabel(self, record):
+        """ Return the text drawn on a card. Override for the app's data. """
+        return '' if record.data is None else str(record.data)
 
     def clear(self):
-        """ Clear the selection buffer when done for reuse. """
-        self.items.clear()
-        self.originWidget = None
-        self.top = None
-        self.left = None
-        self.bottom = None
-        self.right = None
-        self._setExtents()
-
-    def contains(self, widget):
-        """ Indicate if the widget is selected. """
-        return self.items.__contains__(widget)
-
-    def count(self):
-        """ Returns number of widgets currently selected. """
-        return len(self.items)
-
-    def getExtents(self):
-        """ Return extent in t,l,b,r form. """
-        return self.top, self.left, self.bottom, self.right
-
-    def getOrigin(self):
-        return self.originWidget
-
-    def remove(self, widget):
-        """ Remove a widget from the list, if it is there. """
-        if self.items.__contains__(widget):
-            self.items.remove(widget)
-        self._setExtents()
-
-    def _setExtents(self):
-        """ Keep track of extents to check for position collisions on moves. """
-        self.origin = None
-        for widget in self.items:
-            row, col = widget.getPosition()
-            if not self.left or col < self.left:
-                self.left = col
-            if not self.right or col > self.right:
-                self.right = col
-            if not self.top or row < self.top:
-                self.top = row
-            if not self.bottom or row > self.bottom:
-                self.bottom = row
-            # Set the selection origin to the top-left-most widget
-            if row == self.top and col == self.left:
-                self.originWidget = widget
+        """ Clears cards from desktop, without deleting from their database. """
+        self.unfocusCard()
+        super().clear()
+
+    def focusCard(self, record):
+        """ Show the real WidgetFrame over this card, for editing. """
+        if record is self.focused:
+            self.editFrame.focus_set()
+            return
+        self.unfocusCard()
+        if self.editFrame is None:
+            self.editFrame = self.newEditFrame()
+        self.focused = record
+        self.editFrame.bindRecord(record)
+        x, y = self.viewPosition(*record.getPosition())
+        self.editWindow = self.canvas.create_window(x, y, window=self.editFrame, anchor=NW,
+                                                    width=self.widgetW, height=self.widgetH)
+        self.editFrame.focus_set()
+
+    def frameMaster(self):
+        """ Return the Tk parent for WidgetFrames: the canvas (for its window item). """
+        return self.canvas
+
+    def layout(self):
+        """ Set the canvas scroll region (there's no viewport frame to size it),
+            then lay out as usual. """
+        h, w = self.viewSize()
+        self.canvas.configure(scrollregion=(0, 0, w, h), bg=self.bgColor)
+        super().layout()
+
+    def moveDrag(self):
+        """ Draw the latest drag position of a card being dragged. """
+        self.dragPending = None
+        dx = self.dragLast[0] - self.dragDrawn[0]
+        dy = self.dragLast[1] - self.dragDrawn[1]
+        item = self.frames.get(self.dragRecord)
+        if item is not None:
+            self.canvas.move(item.tag, dx, dy)
+            self.canvas.tag_raise(item.tag)
+        self.dragDrawn = self.dragLast
+
+    def newEditFrame(self):
+        """ Create a WidgetFrame for a card shown in full: the focused card, or
+            every card in full detail. Override to create the app's own
+            WidgetFrame subclass. """
+        frame = WidgetFrame(self, 0, 0)
+        # Drag an outline, so the frame stays in its canvas window
+        frame.dragGhost = True
+        return frame
+
+    def newFrame(self):
+        """ Create a card drawing for the pool, to suit the detail tier. """
+        return FrameItem(self) if self.detail == LODFULL else CardItem(self)
+
+    def placeWidget(self, widget):
+        """ Draw a card at its grid position, moving the edit frame with it. """
+        super().placeWidget(widget)
+        if widget is self.focused:
+            self.canvas.coords(self.editWindow, *self.viewPosition(*widget.getPosition()))
+            self.canvas.itemconfig(self.editWindow, width=self.widgetW, height=self.widgetH)
+
+    def releaseFrame(self, record):
+        """ Stop drawing this card (unfocusing it first). """
+        if record is self.focused:
+            self.unfocusCard()
+        super().releaseFrame(record)
+
+    def setDetail(self, detail):
+        """ Switch level of detail tier, redrawing only the cards in view. """
+        full = LODFULL in (detail, self.detail)
+        self.detail = detail
+        if full:
+            # Swap drawing kinds: the next layout draws the cards in view anew
+            self.unfocusCard()
+            for record in list(self.frames):
+                self.releaseFrame(record)
+            self.framePool, self.otherPool = self.otherPool, self.framePool
+        else:
+            for item in self.frames.values():
+                item.showLabel(detail == LODLABELS)
+
+    def unfocusCard(self):
+        """ Take the edit frame off the focused card, if any. """
+        record = self.focused
+        if record is None:
+            return
+        self.focused = None
+        self.editFrame.unbindRecord()
+        self.canvas.delete(self.editWindow)
+        self.editWindow = None
+        # Send changes back to the card's drawing
+        item = self.frames.get(record)
+        if item is not None:
+            item.bindRecord(record)
+
+    # Event handlers ..........................................................
+    def onCanvasCtrlClick(self, event):
+        """ Ctrl-Click on a card toggles its selection. """
+        record = self.cardAt(event.x, event.y)
+        if record is not None:
+            self.selectToggle(record)
+        return 'break'
+
+    def onCanvasMotion(self, event):
+        """ Drag a card, drawing the latest position once per frame at most. """
+        if self.dragRecord is None:
+            return
+        self.dragLast = event.x, event.y
+        if self.dragPending is None:
+            self.dragPending = self.after(1000 // self.dragFps, self.moveDrag)
+
+    def onCanvasPress(self, event):
+        """ Mouse button down: on a card, get ready to drag it or click it. """
+        self.dragRecord = self.cardAt(event.x, event.y)
+        if self.dragRecord is None:
+            self.unfocusCard()
+            self.onClick(event)
+            return
+        self.dragStart = self.dragLast = self.dragDrawn = event.x, event.y
+
+    def onCanvasRelease(self, event):
+        """ Mouse button up: drop a dragged card, or click it. """
+        record, self.dragRecord = self.dragRecord, None
+        if record is None:
+            return
+        if self.dragPending is not None:
+            self.after_cancel(self.dragPending)
+            self.dragPending = None
+        if self.model.dropOffset(record, *self.viewCoords(event.x, event.y)) == (0, 0):
+            # Released over its own cell: a click, however much the mouse jittered
+            self.selectAll(False)
+            self.selectOne(record)
+            self.arrange(record)
+            return
+        self.onDrop(record, event.x, event.y)
+        # Redraw it in place, wherever it ended up
+        self.arrange(record)
+
+    def onCanvasShiftClick(self, event):
+        """ Shift-Click on a card block-selects from the origin. """
+        record = self.cardAt(event.x, event.y)
+        if record is not None:
+            self.selectBlock(record)
+        return 'break'
+
+    def onDrop(self, widget, x, y):
+        """ A card was dropped at canvas widget coordinates x, y. """
+        super().onDrop(widget, *self.viewCoords(x, y))
+
+    def viewCoords(self, x, y):
+        """ Convert canvas widget coords (where WidgetFrames are dragged) to
+            viewport coords, which scroll. """
+        return self.canvas.canvasx(x), self.canvas.canvasy(y)
+
+
+class CardItem:
+    """ The canvas drawing of one card for CanvasDesktopFrame: it stands in
+        for a WidgetFrame, so WidgetRecord changes show up on the canvas. """
+    __slots__ = ('desktop', 'canvas', 'record', 'rect', 'text', 'tag', '_row', '_col')
+
+    def __init__(self, desktop):
+        self.desktop = desktop
+        self.canvas = desktop.canvas
+        self.record = None
+        self._row = self._col = 0
+        # Both items share a tag, to move and raise them together
+        self.tag = 'card' + str(id(self))
+        self.rect = self.canvas.create_rectangle(0, 0, 0, 0, width=3, state=HIDDEN,
+                                                 tags=('card', self.tag))
+        self.text = self.canvas.create_text(0, 0, anchor=NW, state=HIDDEN,
+                                            tags=('card', self.tag))
+
+    def bindRecord(self, record):
+        """ Draw this record. """
+        self.record = record
+        record.frame = self
+        self._row, self._col = record.getPosition()
+        self.showLabel(self.desktop.detail != LODBLOCKS)
+        self.config(background=record.color)
+        self.setSelected(record.selected)
+
+    def config(self, background):
+        """ Same as WidgetFrame.config(background=...). """
+        self.canvas.itemconfig(self.rect, fill=background)
+
+    def focus_set(self):
+        """ Focusing a card swaps in the real edit frame. """
+        self.desktop.focusCard(self.record)
+
+    def place(self, x, y, height, width):
+        """ Same as WidgetFrame.place(): show the card here. """
+        self.canvas.coords(self.rect, x, y, x + width, y + height)
+        self.canvas.coords(self.text, x + CARDTEXTPAD, y + CARDTEXTPAD)
+        self.canvas.itemconfig(self.text, width=max(1, width - 2 * CARDTEXTPAD))
+        self.canvas.itemconfig(self.tag, state=NORMAL)
+
+    def place_forget(self):
+        """ Same as WidgetFrame.place_forget(): hide the card. """
+        self.canvas.itemconfig(self.tag, state=HIDDEN)
+
+    def setSelected(self, active=True):
+        """ Set the highlight state for this card. """
+        self.canvas.itemconfig(self.rect, outline=CARDHILIGHT if active else CARDOUTLINE)
+
+    def showLabel(self, show=True):
+        """ Draw the card's label, or leave it a plain block of color. """
+        text = self.desktop.cardLabel(self.record) if show else ''
+        self.canvas.itemconfig(self.text, text=text)
+
+    def unbindRecord(self):
+        """ Stop drawing the current record. """
+        if self.record is not None:
+            if self.record.frame is self:
+                self.record.frame = None
+            self.record = None
+
+
+class FrameItem:
+    """ A card in full detail for CanvasDesktopFrame: a real WidgetFrame in a
+        canvas window item, placed and hidden like a CardItem. """
+    __slots__ = ('canvas', 'frame', 'window')
+
+    def __init__(self, desktop):
+        self.canvas = desktop.canvas
+        self.frame = desktop.newEditFrame()
+        self.window = self.canvas.create_window(0, 0, window=self.frame, anchor=NW,
+                                                state=HIDDEN)
+
+    def bindRecord(self, record):
+        """ Show this record (it talks to the WidgetFrame directly). """
+        self.frame.bindRecord(record)
+
+    def place(self, x, y, height, width):
+        """ Same as WidgetFrame.place(): show the card here. """
+        self.canvas.coords(self.window, x, y)
+        self.canvas.itemconfig(self.window, height=height, width=width, state=NORMAL)
+
+    def place_forget(self):
+        """ Same as WidgetFrame.place_forget(): hide the card. """
+        self.canvas.itemconfig(self.window, state=HIDDEN)
+
+    def unbindRecord(self):
+        """ Stop showing the current record. """
+        self.frame.unbindRecord()
+
+
+class WidgetRecord:
+    """ A lightweight stand-in for a WidgetFrame, for DesktopFrame's virtual
+        mode. It has the same position, color and selection API, passing
+        changes on to the frame showing it, if it is in view. """
+    __slots__ = ('_row', '_col', 'color', 'selected', 'data', 'frame')
+
+    def __init__(self, row, col, color='white', data=None):
+        self._row = row
+        self._col = col
+        self.color = color
+        self.selected = False
+        # The app's own data for this widget, and the frame showing it
+        self.data = data
+        self.frame = None
+
+    def focus_set(self):
+        """ Focus the frame showing this record, if it is in view. """
+        if self.frame is not None:
+            self.frame.focus_set()
+
+    def getColor(self):
+        """ Return current widget color value. """
+        return self.color
+
+    def getPosition(self):
+        """ Get current position. """
+        return self._row, self._col
+
+    def save(self):
+        """ Override this to save the database record at key moments. """
+        pass
+
+    def setColor(self, color):
+        """ Change widget color. """
+        self.color = color
+        if self.frame is not None:
+            self.frame.config(background=color)
+        self.save()
+
+    def setPosition(self, row, col, save=True):
+        """  Set a new position and save (unless saved in a batch by the desktop). """
+        self._row = row
+        self._col = col
+        if self.frame is not None:
+            self.frame._row, self.frame._col = row, col
+        if save:
+            self.save()
+
+    def setSelected(self, active=True):
+        """ Set the highlight state for this widget. """
+        self.selected = active
+        if self.frame is not None:
+            self.frame.setSelected(active)